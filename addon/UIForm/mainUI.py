@@ -59,11 +59,12 @@ class Ui_Dialog(object):
         self.label = QtWidgets.QLabel(self.mainTab)
         self.label.setObjectName("label")
         self.verticalLayout.addWidget(self.label)
-        self.newWordListWidget = QtWidgets.QListWidget(self.mainTab)
-        self.newWordListWidget.setAlternatingRowColors(True)
-        self.newWordListWidget.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
-        self.newWordListWidget.setObjectName("newWordListWidget")
-        self.verticalLayout.addWidget(self.newWordListWidget)
+        self.newWordListView = QtWidgets.QListView(self.mainTab)
+        self.newWordListView.setAlternatingRowColors(True)
+        self.newWordListView.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
+        self.newWordListView.setUniformItemSizes(True)
+        self.newWordListView.setObjectName("newWordListView")
+        self.verticalLayout.addWidget(self.newWordListView)
         self.horizontalLayout.addLayout(self.verticalLayout)
         self.verticalLayout_2 = QtWidgets.QVBoxLayout()
         self.verticalLayout_2.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
@@ -72,10 +73,11 @@ class Ui_Dialog(object):
         self.label_2 = QtWidgets.QLabel(self.mainTab)
         self.label_2.setObjectName("label_2")
         self.verticalLayout_2.addWidget(self.label_2)
-        self.needDeleteWordListWidget = QtWidgets.QListWidget(self.mainTab)
-        self.needDeleteWordListWidget.setAlternatingRowColors(True)
-        self.needDeleteWordListWidget.setObjectName("needDeleteWordListWidget")
-        self.verticalLayout_2.addWidget(self.needDeleteWordListWidget)
+        self.needDeleteWordListView = QtWidgets.QListView(self.mainTab)
+        self.needDeleteWordListView.setAlternatingRowColors(True)
+        self.needDeleteWordListView.setUniformItemSizes(True)
+        self.needDeleteWordListView.setObjectName("needDeleteWordListView")
+        self.verticalLayout_2.addWidget(self.needDeleteWordListView)
         self.horizontalLayout.addLayout(self.verticalLayout_2)
         self.gridLayout_4.addLayout(self.horizontalLayout, 3, 0, 1, 5)
         self.apiLayout = QtWidgets.QHBoxLayout()
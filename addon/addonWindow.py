@@ -1,28 +1,32 @@
 import sys
 import logging
 import json
+import sqlite3
 from copy import deepcopy
 
-from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QPlainTextEdit, QDialog, QListWidgetItem, QVBoxLayout, QPushButton
 from PyQt5.QtCore import pyqtSlot, QThread, Qt
 
 from .queryApi import apis
 from .UIForm import wordGroup, mainUI, icons_rc
-from .workers import LoginStateCheckWorker, VersionCheckWorker, RemoteWordFetchingWorker, QueryWorker, AudioDownloadWorker
+from .workers import LoginStateCheckWorker, VersionCheckWorker, RemoteWordFetchingWorker, QueryConfig, QueryWorker, AsyncQueryWorker, PullAndQueryWorker, AudioDownloadWorker
 from .dictionary import dictionaries
 from .logger import Handler
 from .loginDialog import LoginDialog
-from .misc import Mask
-from .constants import BASIC_OPTION, EXTRA_OPTION, MODEL_NAME, RELEASE_URL
+from .misc import Mask, shutdownExecutor, getParserPool, shutdownParserPool
+from .cache import QueryCache, SnapshotStore, HttpCache
+from .network import setHttpCache
+from .wordModel import WordListModel
+from .throttle import rateLimiter
+from .constants import BASIC_OPTION, MODEL_NAME, RELEASE_URL, CACHE_DB_PATH
 
 try:
     from aqt import mw
     from aqt.utils import askUser, showCritical, showInfo, tooltip, openLink
-    from .noteManager import getOrCreateDeck, getDeckList, getOrCreateModel, getOrCreateModelCardTemplate, addNoteToDeck, getWordsByDeck, getNotes
+    from .noteManager import getOrCreateDeck, getDeckList, getOrCreateModel, getOrCreateModelCardTemplate, addNotesToDeck, getWordsByDeck, getNotes
 except ImportError:
     from test.dummy_aqt import mw, askUser, showCritical, showInfo, tooltip, openLink
-    from test.dummy_noteManager import getOrCreateDeck, getDeckList, getOrCreateModel, getOrCreateModelCardTemplate, addNoteToDeck, getWordsByDeck, getNotes
+    from test.dummy_noteManager import getOrCreateDeck, getDeckList, getOrCreateModel, getOrCreateModelCardTemplate, addNotesToDeck, getWordsByDeck, getNotes
 
 logger = logging.getLogger('dict2Anki')
 
@@ -56,9 +60,17 @@ class Windows(QDialog, mainUI.Ui_Dialog):
         self.queryWorker = None
         self.pullWorker = None
         self.audioDownloadWorker = None
+        self.queryCache = None
+        self.bypassQueryCache = False
+        self.snapshotStore = None
+        self.httpCache = None
 
         self.setupUi(self)
         self.setWindowTitle(MODEL_NAME)
+        self.newWordModel = WordListModel(self)
+        self.newWordListView.setModel(self.newWordModel)
+        self.needDeleteWordModel = WordListModel(self, checkable=True)
+        self.needDeleteWordListView.setModel(self.needDeleteWordModel)
         self.setupLogger()
         self.initCore()
         self.checkUpdate()
@@ -73,9 +85,13 @@ class Windows(QDialog, mainUI.Ui_Dialog):
         self.gridLayout_4.addWidget(self.devBtn, 4, 3, 1, 1)
 
     def closeEvent(self, event):
-        # 插件关闭时退出所有线程
+        # 插件关闭时退出所有线程，先请求中断，再取消线程池中尚未开始的任务
+        self.workerThread.requestInterruption()
+        self.audioDownloadThread.requestInterruption()
+        shutdownExecutor(wait=False)
+        shutdownParserPool(wait=False)
+
         if self.workerThread.isRunning():
-            self.workerThread.requestInterruption()
             self.workerThread.quit()
             self.workerThread.wait()
 
@@ -84,9 +100,18 @@ class Windows(QDialog, mainUI.Ui_Dialog):
             self.updateCheckThead.wait()
 
         if self.audioDownloadThread.isRunning():
-            self.audioDownloadThread.requestInterruption()
-            self.workerThread.quit()
-            self.workerThread.wait()
+            self.audioDownloadThread.quit()
+            self.audioDownloadThread.wait()
+
+        if self.queryCache:
+            self.queryCache.close()
+
+        if self.snapshotStore:
+            self.snapshotStore.close()
+
+        if self.httpCache:
+            setHttpCache(None)
+            self.httpCache.close()
 
         event.accept()
 
@@ -139,6 +164,51 @@ class Windows(QDialog, mainUI.Ui_Dialog):
         self.apiComboBox.addItems([d.name for d in apis])
         self.deckComboBox.addItems(getDeckList())
         self.setupGUIByConfig()
+        self.setupQueryCache()
+        self.setupSnapshotStore()
+        self.setupHttpCache()
+        rateLimiter.configure(mw.addonManager.getConfig(__name__).get('rateLimit'))
+
+    def setupQueryCache(self):
+        """初始化查询结果缓存"""
+        config = mw.addonManager.getConfig(__name__).get('queryCache') or dict()
+        self.bypassQueryCache = config.get('bypass', False)
+        try:
+            self.queryCache = QueryCache(
+                CACHE_DB_PATH,
+                ttl=config.get('ttlDays', 30) * 24 * 3600,
+                maxEntries=config.get('maxEntries', 50000),
+                negativeTtl=config.get('negativeTtlHours', 24) * 3600
+            )
+        except sqlite3.Error as e:
+            logger.exception(f'查询缓存初始化失败{e}')
+
+    def setupSnapshotStore(self):
+        """初始化单词本分组快照，设置 incrementalPull 时增量获取单词"""
+        if not mw.addonManager.getConfig(__name__).get('incrementalPull', False):
+            return
+        try:
+            self.snapshotStore = SnapshotStore(CACHE_DB_PATH)
+        except sqlite3.Error as e:
+            logger.exception(f'分组快照初始化失败{e}')
+
+    def setupHttpCache(self):
+        """初始化 HTTP 条件请求缓存，词典和查询 API 的请求共用"""
+        config = mw.addonManager.getConfig(__name__).get('httpCache') or dict()
+        if not config.get('enabled', True):
+            return
+        try:
+            self.httpCache = HttpCache(CACHE_DB_PATH, maxSize=config.get('maxSizeMB', 100) * 1024 * 1024)
+            setHttpCache(self.httpCache)
+        except sqlite3.Error as e:
+            logger.exception(f'HTTP 缓存初始化失败{e}')
+
+    def getQueryCache(self):
+        """本次查询使用的缓存，设置跳过缓存时返回 None"""
+        if self.bypassQueryCache:
+            logger.info('跳过查询缓存')
+            return None
+        return self.queryCache
 
     def getAndSaveCurrentConfig(self) -> dict:
         """获取当前设置"""
@@ -167,7 +237,8 @@ class Windows(QDialog, mainUI.Ui_Dialog):
 
     @staticmethod
     def _saveConfig(config):
-        _config = deepcopy(config)
+        _config = mw.addonManager.getConfig(__name__)  # 保留界面上没有的配置项
+        _config.update(deepcopy(config))
         _config['credential'] = [dict(username='', password='', cookie='')] * len(dictionaries)
         _config['credential'][_config['selectedDict']] = dict(
             username=_config.pop('username'),
@@ -271,9 +342,9 @@ class Windows(QDialog, mainUI.Ui_Dialog):
 
         def onAccepted():
             """选择单词本弹窗确定事件"""
-            # 清空 listWidget
-            self.newWordListWidget.clear()
-            self.needDeleteWordListWidget.clear()
+            # 清空单词列表
+            self.newWordModel.clear()
+            self.needDeleteWordModel.clear()
             self.mainTab.setEnabled(False)
 
             selectedGroups = [group.wordGroupListWidget.item(index).text() for index in range(group.wordGroupListWidget.count()) if
@@ -283,7 +354,10 @@ class Windows(QDialog, mainUI.Ui_Dialog):
             self.progressBar.setValue(0)
             self.progressBar.setMaximum(1)
             logger.info(f'选中单词本{selectedGroups}')
-            self.getRemoteWordList(selectedGroups)
+            if mw.addonManager.getConfig(__name__).get('pullAndQuery', False):
+                self.pullAndQueryRemoteWordList(selectedGroups)
+            else:
+                self.getRemoteWordList(selectedGroups)
 
         def onRejected():
             """选择单词本弹窗取消事件"""
@@ -296,64 +370,81 @@ class Windows(QDialog, mainUI.Ui_Dialog):
         container.exec()
 
     def getRemoteWordList(self, selected_groups: [str]):
-        """根据选中到分组获取分组下到全部单词，并添加到 newWordListWidget"""
+        """根据选中到分组获取分组下到全部单词，并添加到 newWordModel"""
         group_map = dict(self.selectedDict.groups)
         self.localWords = getWordsByDeck(self.deckComboBox.currentText())
 
         # 启动单词获取线程
-        self.pullWorker = RemoteWordFetchingWorker(self.selectedDict, [(group_name, group_map[group_name],) for group_name in selected_groups])
+        self.pullWorker = RemoteWordFetchingWorker(
+            self.selectedDict,
+            [(group_name, group_map[group_name],) for group_name in selected_groups],
+            snapshots=self.snapshotStore,
+            localWords=self.localWords
+        )
+        self.pullWorker.moveToThread(self.workerThread)
+        self.pullWorker.start.connect(self.pullWorker.run)
+        self.pullWorker.tick.connect(self.addProgress)
+        self.pullWorker.setProgress.connect(self.progressBar.setMaximum)
+        self.pullWorker.diffDone.connect(self.on_allPullWork_done)
+        self.pullWorker.start.emit()
+
+    def pullAndQueryRemoteWordList(self, selectedGroups: [str]):
+        """获取单词的同时查询新单词，新单词逐页添加到 newWordModel"""
+        groupMap = dict(self.selectedDict.groups)
+        self.localWords = getWordsByDeck(self.deckComboBox.currentText())
+
+        self.pullWorker = PullAndQueryWorker(
+            self.selectedDict,
+            [(groupName, groupMap[groupName],) for groupName in selectedGroups],
+            set(self.localWords),
+            self.getQueryConfig(apis[self.currentConfig['selectedApi']]),
+            snapshots=self.snapshotStore
+        )
         self.pullWorker.moveToThread(self.workerThread)
         self.pullWorker.start.connect(self.pullWorker.run)
-        self.pullWorker.tick.connect(lambda: self.progressBar.setValue(self.progressBar.value() + 1))
+        self.pullWorker.tick.connect(self.addProgress)
         self.pullWorker.setProgress.connect(self.progressBar.setMaximum)
-        self.pullWorker.doneThisGroup.connect(self.insertWordToListWidget)
-        self.pullWorker.done.connect(self.on_allPullWork_done)
+        self.pullWorker.newWords.connect(self.appendNewWords)
+        self.pullWorker.rowsDone.connect(self.on_rowsDone)
+        self.pullWorker.rowsFailed.connect(self.on_rowsFailed)
+        self.pullWorker.diffDone.connect(self.on_pullAndQueryPullDone)
+        self.pullWorker.allQueryDone.connect(self.on_pullAndQueryDone)
         self.pullWorker.start.emit()
 
     @pyqtSlot(list)
-    def insertWordToListWidget(self, words: list):
-        """一个分组获取完毕事件"""
-        for word in words:
-            wordItem = QListWidgetItem(word, self.newWordListWidget)
-            wordItem.setData(Qt.UserRole, None)
-        self.newWordListWidget.clearSelection()
+    def appendNewWords(self, words: list):
+        """边获取边查询模式下发现新单词事件"""
+        self.newWordModel.appendWords(words, WordListModel.WAIT)
+
+    @pyqtSlot(list, list, list)
+    def on_pullAndQueryPullDone(self, newWords: list, needToDeleteWords: list, unchangedWords: list):
+        """边获取边查询模式下全部分组获取完毕事件，此时查询可能仍在进行"""
+        self.needDeleteWordModel.setWords(needToDeleteWords, WordListModel.DELETE)
 
     @pyqtSlot()
-    def on_allPullWork_done(self):
-        """全部分组获取完毕事件"""
-        localWordList = set(getWordsByDeck(self.deckComboBox.currentText()))
-        remoteWordList = set([self.newWordListWidget.item(row).text() for row in range(self.newWordListWidget.count())])
-
-        newWords = remoteWordList - localWordList  # 新单词
-        needToDeleteWords = localWordList - remoteWordList  # 需要删除的单词
-        logger.info(f'本地: {localWordList}')
-        logger.info(f'远程: {remoteWordList}')
-        logger.info(f'待查: {newWords}')
-        logger.info(f'待删: {needToDeleteWords}')
-        waitIcon = QIcon(':/icons/wait.png')
-        delIcon = QIcon(':/icons/delete.png')
-        self.newWordListWidget.clear()
-        self.needDeleteWordListWidget.clear()
-
-        for word in needToDeleteWords:
-            item = QListWidgetItem(word)
-            item.setCheckState(Qt.Checked)
-            item.setIcon(delIcon)
-            self.needDeleteWordListWidget.addItem(item)
-
-        for word in newWords:
-            item = QListWidgetItem(word)
-            item.setIcon(waitIcon)
-            self.newWordListWidget.addItem(item)
-        self.newWordListWidget.clearSelection()
+    def on_pullAndQueryDone(self):
+        """边获取边查询模式下全部查询完毕事件"""
+        self.on_allQueryDone()
+        self.syncBtn.setEnabled(self.newWordModel.rowCount() > 0 or self.needDeleteWordModel.rowCount() > 0)
+        if self.needDeleteWordModel.rowCount() == self.newWordModel.rowCount() == 0:
+            logger.info('无需同步')
+            tooltip('无需同步')
+        self.mainTab.setEnabled(True)
+
+    @pyqtSlot(list, list, list)
+    def on_allPullWork_done(self, newWords: list, needToDeleteWords: list, unchangedWords: list):
+        """全部分组获取完毕事件，单词比较已在工作线程中完成"""
+        self.needDeleteWordModel.setWords(needToDeleteWords, WordListModel.DELETE)
+        self.newWordModel.setWords(newWords, WordListModel.WAIT)
+        self.newWordListView.clearSelection()
 
         self.dictionaryComboBox.setEnabled(True)
         self.apiComboBox.setEnabled(True)
         self.deckComboBox.setEnabled(True)
         self.pullRemoteWordsBtn.setEnabled(True)
-        self.queryBtn.setEnabled(self.newWordListWidget.count() > 0)
-        self.syncBtn.setEnabled(self.newWordListWidget.count() == 0 and self.needDeleteWordListWidget.count() > 0)
-        if self.needDeleteWordListWidget.count() == self.newWordListWidget.count() == 0:
+        self.queryBtn.setEnabled(self.newWordModel.rowCount() > 0)
+        self.syncBtn.setEnabled(self.newWordModel.rowCount() == 0 and self.needDeleteWordModel.rowCount() > 0)
+        if self.needDeleteWordModel.rowCount() == self.newWordModel.rowCount() == 0:
             logger.info('无需同步')
             tooltip('无需同步')
         self.mainTab.setEnabled(True)
@@ -366,62 +457,70 @@ class Windows(QDialog, mainUI.Ui_Dialog):
         self.pullRemoteWordsBtn.setEnabled(False)
         self.syncBtn.setEnabled(False)
 
-        wordList = []
-        selectedWords = self.newWordListWidget.selectedItems()
-        if selectedWords:
+        selectedRows = self.newWordListView.selectionModel().selectedRows()
+        if selectedRows:
             # 如果选中单词则只查询选中的单词
-            for wordItem in selectedWords:
-                wordBundle = dict()
-                row = self.newWordListWidget.row(wordItem)
-                wordBundle['term'] = wordItem.text()
-                for configName in BASIC_OPTION + EXTRA_OPTION:
-                    wordBundle[configName] = currentConfig[configName]
-                    wordBundle['row'] = row
-                wordList.append(wordBundle)
+            rows = sorted(index.row() for index in selectedRows)
+            terms = [self.newWordModel.words[row] for row in rows]
         else:  # 没有选择则查询全部
-            for row in range(self.newWordListWidget.count()):
-                wordBundle = dict()
-                wordItem = self.newWordListWidget.item(row)
-                wordBundle['term'] = wordItem.text()
-                for configName in BASIC_OPTION + EXTRA_OPTION:
-                    wordBundle[configName] = currentConfig[configName]
-                    wordBundle['row'] = row
-                wordList.append(wordBundle)
-
-        logger.info(f'待查询单词{wordList}')
+            rows = range(self.newWordModel.rowCount())
+            terms = list(self.newWordModel.words)
+
+        logger.info(f'待查询单词{len(terms)}个')
+        logger.debug(f'待查询单词{terms}')
         # 查询线程
-        self.progressBar.setMaximum(len(wordList))
-        self.queryWorker = QueryWorker(wordList, apis[currentConfig['selectedApi']])
+        self.progressBar.setMaximum(len(terms))
+        self.queryWorker = self.createQueryWorker(terms, rows, self.getQueryConfig(apis[currentConfig['selectedApi']]))
         self.queryWorker.moveToThread(self.workerThread)
-        self.queryWorker.thisRowDone.connect(self.on_thisRowDone)
-        self.queryWorker.thisRowFailed.connect(self.on_thisRowFailed)
-        self.queryWorker.tick.connect(lambda: self.progressBar.setValue(self.progressBar.value() + 1))
+        self.queryWorker.rowsDone.connect(self.on_rowsDone)
+        self.queryWorker.rowsFailed.connect(self.on_rowsFailed)
+        self.queryWorker.tick.connect(self.addProgress)
         self.queryWorker.allQueryDone.connect(self.on_allQueryDone)
         self.queryWorker.start.connect(self.queryWorker.run)
         self.queryWorker.start.emit()
 
-    @pyqtSlot(int, dict)
-    def on_thisRowDone(self, row, result):
-        """该行单词查询完毕"""
-        doneIcon = QIcon(':/icons/done.png')
-        wordItem = self.newWordListWidget.item(row)
-        wordItem.setIcon(doneIcon)
-        wordItem.setData(Qt.UserRole, result)
+    def createQueryWorker(self, terms: [str], rows: [int], config: QueryConfig) -> QueryWorker:
+        """根据配置的 queryEngine 选择查询引擎"""
+        engine = mw.addonManager.getConfig(__name__).get('queryEngine', 'thread')
+        if engine == 'asyncio':
+            if not getattr(config.api, 'asyncCapable', True):
+                logger.warning(f'{config.api.name} 不支持 asyncio 查询引擎，使用线程池查询引擎')
+            elif AsyncQueryWorker.isAvailable:
+                logger.info('使用 asyncio 查询引擎')
+                return AsyncQueryWorker(terms, rows, config)
+            logger.warning('未安装 aiohttp，使用线程池查询引擎')
+        return QueryWorker(terms, rows, config)
+
+    def getQueryConfig(self, api) -> QueryConfig:
+        """本次查询所有单词共用的配置"""
+        return QueryConfig(api, fields=self.getQueryFields(), cache=self.getQueryCache(), parserPool=self.getParserPool())
+
+    @staticmethod
+    def getParserPool():
+        """根据配置的 parseProcesses 获取解析进程池，为 0 时在查询线程中解析"""
+        return getParserPool(mw.addonManager.getConfig(__name__).get('parseProcesses', 0))
+
+    def getQueryFields(self) -> frozenset:
+        """勾选的字段，查询时只请求和解析这些字段"""
+        return frozenset(configName for configName in BASIC_OPTION if self.currentConfig.get(configName))
 
     @pyqtSlot(int)
-    def on_thisRowFailed(self, row):
-        failedIcon = QIcon(':/icons/failed.png')
-        failedWordItem = self.newWordListWidget.item(row)
-        failedWordItem.setIcon(failedIcon)
+    def addProgress(self, n):
+        """工作线程合并后的进度"""
+        self.progressBar.setValue(self.progressBar.value() + n)
+
+    @pyqtSlot(list)
+    def on_rowsDone(self, rows):
+        """一批单词查询完毕 [(行号, 查询结果)]"""
+        self.newWordModel.setResults(rows)
+
+    @pyqtSlot(list)
+    def on_rowsFailed(self, rows):
+        self.newWordModel.setFailed(rows)
 
     @pyqtSlot()
     def on_allQueryDone(self):
-        failed = []
-
-        for i in range(self.newWordListWidget.count()):
-            wordItem = self.newWordListWidget.item(i)
-            if not wordItem.data(Qt.UserRole):
-                failed.append(wordItem.text())
+        failed = [word for word, result in zip(self.newWordModel.words, self.newWordModel.results) if not result]
 
         if failed:
             logger.warning(f'查询失败或未查询:{failed}')
@@ -433,8 +532,7 @@ class Windows(QDialog, mainUI.Ui_Dialog):
     @pyqtSlot()
     def on_syncBtn_clicked(self):
 
-        failedGenerator = (self.newWordListWidget.item(row).data(Qt.UserRole) is None for row in range(self.newWordListWidget.count()))
-        if any(failedGenerator):
+        if any(result is None for result in self.newWordModel.results):
             if not askUser('存在未查询或失败的单词，确定要加入单词本吗？\n 你可以选择失败的单词点击 "查询按钮" 来重试。'):
                 return
 
@@ -445,7 +543,6 @@ class Windows(QDialog, mainUI.Ui_Dialog):
 
         logger.info('同步点击')
         audiosDownloadTasks = []
-        newWordCount = self.newWordListWidget.count()
 
         # 判断是否需要下载发音
         if currentConfig['noPron']:
@@ -455,16 +552,15 @@ class Windows(QDialog, mainUI.Ui_Dialog):
             whichPron = 'AmEPron' if self.AmEPronRadioButton.isChecked() else 'BrEPron'
             logger.info(f'下载发音{whichPron}')
 
-        added = 0
-        for row in range(newWordCount):
-            wordItem = self.newWordListWidget.item(row)
-            wordItemData = wordItem.data(Qt.UserRole)
+        queryResults = []
+        for wordItemData in self.newWordModel.results:
             if wordItemData:
-                addNoteToDeck(deck, model, currentConfig, wordItemData)
-                added += 1
+                queryResults.append(wordItemData)
                 # 添加发音任务
-                if whichPron and wordItemData.get(whichPron):
-                    audiosDownloadTasks.append((f"{whichPron}_{wordItemData['term']}.mp3", wordItemData[whichPron],))
+                pronUrl = wordItemData.get(whichPron) if whichPron else None
+                if pronUrl:
+                    audiosDownloadTasks.append((f"{whichPron}_{wordItemData.term}.mp3", pronUrl,))
+        added = addNotesToDeck(deck, model, currentConfig, queryResults)
         mw.reset()
 
         logger.info(f'发音下载任务:{audiosDownloadTasks}')
@@ -482,31 +578,26 @@ class Windows(QDialog, mainUI.Ui_Dialog):
             self.audioDownloadThread.start()
             self.audioDownloadWorker = AudioDownloadWorker(audiosDownloadTasks)
             self.audioDownloadWorker.moveToThread(self.audioDownloadThread)
-            self.audioDownloadWorker.tick.connect(lambda: self.progressBar.setValue(self.progressBar.value() + 1))
+            self.audioDownloadWorker.tick.connect(self.addProgress)
             self.audioDownloadWorker.start.connect(self.audioDownloadWorker.run)
             self.audioDownloadWorker.done.connect(lambda: tooltip(f'发音下载完成'))
             self.audioDownloadWorker.done.connect(self.audioDownloadThread.quit)
             self.audioDownloadWorker.start.emit()
 
-        self.newWordListWidget.clear()
+        self.newWordModel.clear()
 
-        needToDeleteWordItems = [
-            self.needDeleteWordListWidget.item(row)
-            for row in range(self.needDeleteWordListWidget.count())
-            if self.needDeleteWordListWidget.item(row).checkState() == Qt.Checked
-        ]
-        needToDeleteWords = [i.text() for i in needToDeleteWordItems]
+        needToDeleteWords = self.needDeleteWordModel.checkedWords()
 
         deleted = 0
 
         if needToDeleteWords and askUser(f'确定要删除这些单词吗:{needToDeleteWords[:3]}...({len(needToDeleteWords)}个)', title='Dict2Anki', parent=self):
             needToDeleteWordNoteIds = getNotes(needToDeleteWords, currentConfig['deck'])
+            mw.checkpoint('Dict2Anki 删除笔记')
             mw.col.remNotes(needToDeleteWordNoteIds)
-            deleted += 1
+            deleted = len(needToDeleteWordNoteIds)
             mw.col.reset()
             mw.reset()
-            for item in needToDeleteWordItems:
-                self.needDeleteWordListWidget.takeItem(self.needDeleteWordListWidget.row(item))
+            self.needDeleteWordModel.removeWords(needToDeleteWords)
             logger.info('删除完成')
         logger.info('完成')
 
@@ -0,0 +1,319 @@
+import os
+import json
+import hashlib
+import time
+import sqlite3
+import logging
+from threading import Lock
+from .constants import BASIC_OPTION
+from .misc import QueryResult
+
+logger = logging.getLogger('dict2Anki.cache')
+
+
+class SqliteStore:
+    """
+    基于 SQLite 的本地存储，所有线程共用一个连接，由锁保证串行访问
+    子类通过 schema 声明自己的表结构
+    """
+    schema = ''
+
+    def __init__(self, path):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(self.schema)
+            self._conn.commit()
+
+    def _execute(self, sql, params=(), commit=False) -> list:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            if commit:
+                self._conn.commit()
+            return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueryCache(SqliteStore):
+    """
+    单词查询结果缓存
+    以 (API名称, 规范化后的单词, 解析器版本) 为键，过期时间之外按最近访问时间淘汰
+    同时记录查询时请求的字段，缓存的字段包含本次需要的全部字段时才算命中
+    查询无结果和解析失败的单词另外记录，有效期较短，网络错误不记录
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS query_cache (
+            api TEXT NOT NULL,
+            term TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            fields TEXT,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (api, term, version)
+        );
+        CREATE INDEX IF NOT EXISTS query_cache_accessed ON query_cache (accessed);
+        CREATE TABLE IF NOT EXISTS negative_cache (
+            api TEXT NOT NULL,
+            term TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            created REAL NOT NULL,
+            PRIMARY KEY (api, term, version)
+        );
+    '''
+
+    def __init__(self, path, ttl=30 * 24 * 3600, maxEntries=50000, negativeTtl=24 * 3600):
+        """
+        :param path: 数据库文件路径
+        :param ttl: 缓存有效期(秒)
+        :param maxEntries: 最多缓存条数，超出后淘汰最久未使用的结果
+        :param negativeTtl: 查询无结果的有效期(秒)
+        """
+        super().__init__(path)
+        # 旧版本的缓存表没有 fields 列，其中的结果包含全部字段
+        if 'fields' not in [row[1] for row in self._execute('PRAGMA table_info(query_cache)')]:
+            self._execute('ALTER TABLE query_cache ADD COLUMN fields TEXT', commit=True)
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.negativeTtl = negativeTtl
+        self.hits = 0
+        self.misses = 0
+        self.negativeHits = 0
+
+    @staticmethod
+    def _key(api, term) -> tuple:
+        return api.name, ' '.join(term.split()), getattr(api.parser, 'version', 0)
+
+    @staticmethod
+    def _dumpFields(fields) -> str:
+        return None if fields is None else json.dumps(sorted(fields))
+
+    @staticmethod
+    def _covers(cachedFields, fields) -> bool:
+        if cachedFields is None:
+            return True
+        return fields is not None and set(json.loads(cachedFields)).issuperset(fields)
+
+    def get(self, api, term, fields=None) -> QueryResult:
+        """
+        读取缓存
+        :param api: 查询 API
+        :param term: 单词
+        :param fields: 需要的字段，None 表示全部
+        :return: 查询结果，未命中、已过期或缺少需要的字段时返回 None
+        """
+        key = self._key(api, term)
+        now = time.time()
+        rows = self._execute('SELECT result, created, fields FROM query_cache WHERE api=? AND term=? AND version=?', key)
+        if not rows or now - rows[0][1] > self.ttl or not self._covers(rows[0][2], fields):
+            self.misses += 1
+            return None
+
+        self._execute('UPDATE query_cache SET accessed=? WHERE api=? AND term=? AND version=?', (now, *key), commit=True)
+        self.hits += 1
+        result = QueryResult.loads(rows[0][0])
+        result.term = term
+        if fields is not None:
+            # 与直接查询的结果一致，多缓存的字段不返回
+            for name in BASIC_OPTION:
+                if name not in fields:
+                    setattr(result, name, None)
+        return result
+
+    def put(self, api, term, result: QueryResult, fields=None):
+        """
+        写入缓存
+        :param api: 查询 API
+        :param term: 单词
+        :param result: 查询结果
+        :param fields: 查询时请求的字段，None 表示全部
+        """
+        now = time.time()
+        self._execute(
+            'INSERT OR REPLACE INTO query_cache (api, term, version, result, fields, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (*self._key(api, term), QueryResult.of(result).dumps(), self._dumpFields(fields), now, now),
+            commit=True
+        )
+
+    def isKnownEmpty(self, api, term) -> bool:
+        """单词近期查询无结果或解析失败"""
+        rows = self._execute(
+            'SELECT created FROM negative_cache WHERE api=? AND term=? AND version=?',
+            self._key(api, term)
+        )
+        if rows and time.time() - rows[0][0] <= self.negativeTtl:
+            self.negativeHits += 1
+            return True
+        return False
+
+    def putEmpty(self, api, term, reason):
+        """
+        记录查询无结果的单词
+        :param api: 查询 API
+        :param term: 单词
+        :param reason: empty(没有结果) 或 parse(解析失败)
+        """
+        self._execute(
+            'INSERT OR REPLACE INTO negative_cache (api, term, version, reason, created) VALUES (?, ?, ?, ?, ?)',
+            (*self._key(api, term), reason, time.time()),
+            commit=True
+        )
+
+    def evict(self):
+        """清除过期结果，并按最近访问时间淘汰超出容量的结果"""
+        self._execute('DELETE FROM query_cache WHERE created < ?', (time.time() - self.ttl,), commit=True)
+        self._execute('DELETE FROM negative_cache WHERE created < ?', (time.time() - self.negativeTtl,), commit=True)
+        self._execute(
+            'DELETE FROM query_cache WHERE rowid IN (SELECT rowid FROM query_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.maxEntries,),
+            commit=True
+        )
+        logger.info(f'查询缓存命中{self.hits}次，未命中{self.misses}次，跳过无结果单词{self.negativeHits}次')
+
+    def clear(self):
+        self._execute('DELETE FROM query_cache', commit=True)
+        self._execute('DELETE FROM negative_cache', commit=True)
+
+
+class SnapshotStore(SqliteStore):
+    """
+    单词本各分组上次获取到的单词，按词典返回的顺序保存，用于增量获取
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS pull_snapshot (
+            dictionary TEXT NOT NULL,
+            groupId TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            words TEXT NOT NULL,
+            updated REAL NOT NULL,
+            PRIMARY KEY (dictionary, groupId)
+        );
+    '''
+
+    def get(self, dictionary, groupId) -> dict:
+        """
+        读取分组快照
+        :param dictionary: 词典名称
+        :param groupId: 分组id
+        :return: {'total': 单词数, 'words': 单词列表}，没有快照时返回 None
+        """
+        rows = self._execute(
+            'SELECT total, words FROM pull_snapshot WHERE dictionary=? AND groupId=?',
+            (dictionary, str(groupId))
+        )
+        if not rows:
+            return None
+        total, words = rows[0]
+        return {'total': total, 'words': json.loads(words)}
+
+    def put(self, dictionary, groupId, words: [str]):
+        """
+        保存分组快照
+        :param dictionary: 词典名称
+        :param groupId: 分组id
+        :param words: 分组下全部单词，按词典返回的顺序
+        """
+        self._execute(
+            'INSERT OR REPLACE INTO pull_snapshot (dictionary, groupId, total, words, updated) VALUES (?, ?, ?, ?, ?)',
+            (dictionary, str(groupId), len(words), json.dumps(words, ensure_ascii=False), time.time()),
+            commit=True
+        )
+
+    def clear(self):
+        self._execute('DELETE FROM pull_snapshot', commit=True)
+
+
+class HttpCache(SqliteStore):
+    """
+    HTTP 响应缓存，保存带 ETag 或 Last-Modified 的响应，再次请求时由服务端验证
+    键包含请求方法、地址、请求体和 Cookie，不同账号的响应不会混用
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            etag TEXT,
+            lastModified TEXT,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            encoding TEXT,
+            size INTEGER NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS http_cache_accessed ON http_cache (accessed);
+    '''
+
+    def __init__(self, path, maxSize=100 * 1024 * 1024):
+        """
+        :param path: 数据库文件路径
+        :param maxSize: 缓存的响应体总大小上限(字节)，超出后淘汰最久未使用的响应
+        """
+        super().__init__(path)
+        self.maxSize = maxSize
+        self._statsLock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def countHit(self):
+        with self._statsLock:
+            self.hits += 1
+
+    def countMiss(self):
+        with self._statsLock:
+            self.misses += 1
+
+    @staticmethod
+    def key(request) -> str:
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha1(f'{request.method} {request.url}\n{request.headers.get("Cookie", "")}\n'.encode('utf-8'))
+        digest.update(body)
+        return digest.hexdigest()
+
+    def get(self, key) -> dict:
+        """
+        :param key: 请求的键
+        :return: {'etag', 'lastModified', 'headers', 'body', 'encoding'}，没有缓存时返回 None
+        """
+        rows = self._execute('SELECT etag, lastModified, headers, body, encoding FROM http_cache WHERE key=?', (key,))
+        if not rows:
+            return None
+        etag, lastModified, headers, body, encoding = rows[0]
+        return {'etag': etag, 'lastModified': lastModified, 'headers': json.loads(headers), 'body': body, 'encoding': encoding}
+
+    def put(self, key, url, etag, lastModified, headers: dict, body: bytes, encoding):
+        self._execute(
+            'INSERT OR REPLACE INTO http_cache (key, url, etag, lastModified, headers, body, encoding, size, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, url, etag, lastModified, json.dumps(headers), body, encoding, len(body), time.time()),
+            commit=True
+        )
+
+    def touch(self, key):
+        """服务端验证缓存仍然有效(304)"""
+        self._execute('UPDATE http_cache SET accessed=? WHERE key=?', (time.time(), key), commit=True)
+
+    def evict(self):
+        """按最近访问时间淘汰超出大小上限的响应"""
+        total = 0
+        expired = []
+        for key, size in self._execute('SELECT key, size FROM http_cache ORDER BY accessed DESC'):
+            total += size
+            if total > self.maxSize:
+                expired.append((key,))
+        if expired:
+            with self._lock:
+                self._conn.executemany('DELETE FROM http_cache WHERE key=?', expired)
+                self._conn.commit()
+        logger.info(f'HTTP 缓存验证有效(304){self.hits}次，未命中{self.misses}次，淘汰{len(expired)}个')
+
+    def clear(self):
+        self._execute('DELETE FROM http_cache', commit=True)
@@ -1,3 +1,5 @@
+import os
+
 VERSION = 'v6.1.5'
 RELEASE_URL = 'https://github.com/megachweng/Dict2Anki'
 VERSION_CHECK_API = 'https://api.github.com/repos/megachweng/Dict2Anki/releases/latest'
@@ -6,4 +8,7 @@ MODEL_NAME = f'Dict2Anki-{VERSION}'
 BASIC_OPTION = ['definition', 'sentence', 'phrase', 'image', 'BrEPhonetic', 'AmEPhonetic']  # 顺序和名称不可修改
 EXTRA_OPTION = ['BrEPron', 'AmEPron', 'noPron']  # 顺序和名称不可修改
 
-MODEL_FIELDS = ['term', 'definition', 'sentenceFront', 'sentenceBack', 'phraseFront', 'phraseBack', 'image', 'BrEPhonetic', 'AmEPhonetic', 'BrEPron', 'AmEPron']  # 名称不可修改
\ No newline at end of file
+MODEL_FIELDS = ['term', 'definition', 'sentenceFront', 'sentenceBack', 'phraseFront', 'phraseBack', 'image', 'BrEPhonetic', 'AmEPhonetic', 'BrEPron', 'AmEPron']  # 名称不可修改
+
+USER_FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'user_files')  # 插件升级时 Anki 会保留该目录
+CACHE_DB_PATH = os.path.join(USER_FILES_DIR, 'cache.db')
\ No newline at end of file
@@ -1,10 +1,8 @@
-import time
 import logging
 import requests
 from math import ceil
 from bs4 import BeautifulSoup
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from ..network import CachingAdapter, defaultRetries
 from ..misc import AbstractDictionary
 
 logger = logging.getLogger('dict2Anki.dictionary.eudict')
@@ -17,14 +15,17 @@ class Eudict(AbstractDictionary):
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36',
     }
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', CachingAdapter(max_retries=retries))
+    session.mount('https://', CachingAdapter(max_retries=retries))
+
+    newestFirst = True  # 生词本按添加时间倒序返回，可以增量获取；顺序在获取时用首页和末页核对，不符时全部获取
 
     def __init__(self):
         self.groups = []
         self.indexSoup = None
+        self.groupTotalWords = dict()
 
     def checkCookie(self, cookie: dict) -> bool:
         """
@@ -61,26 +62,40 @@ class Eudict(AbstractDictionary):
         logger.info(f'单词本分组:{groups}')
         self.groups = groups
 
+    def getTotalWords(self, groupName: str, groupId: int) -> int:
+        """
+        获取分组下单词总数，同一实例中每个分组只请求一次
+        :param groupName: 分组名称
+        :param groupId:分组id
+        :return: 单词总数，请求失败返回 None
+        """
+        if groupId not in self.groupTotalWords:
+            try:
+                r = self.session.get(
+                    url='https://my.eudic.net/StudyList/WordsDataSource',
+                    timeout=self.timeout,
+                    data={'categoryid': groupId}
+                )
+                self.groupTotalWords[groupId] = r.json()['recordsTotal']
+            except Exception as error:
+                logger.exception(f'网络异常{error}')
+                return None
+        return self.groupTotalWords[groupId]
+
     def getTotalPage(self, groupName: str, groupId: int) -> int:
         """
-        获取分组下总页数
+        获取分组下总页数，每次获取单词前调用，重新请求单词总数
         :param groupName: 分组名称
         :param groupId:分组id
         :return:
         """
-        try:
-            r = self.session.get(
-                url='https://my.eudic.net/StudyList/WordsDataSource',
-                timeout=self.timeout,
-                data={'categoryid': groupId}
-            )
-            records = r.json()['recordsTotal']
-            totalPages = ceil(records / 100)
-            logger.info(f'该分组({groupName}-{groupId})下共有{totalPages}页')
-            return totalPages
-        except Exception as error:
-            logger.exception(f'网络异常{error}')
+        self.groupTotalWords.pop(groupId, None)
+        records = self.getTotalWords(groupName, groupId)
+        if records is None:
             return 0
+        totalPages = ceil(records / 100)
+        logger.info(f'该分组({groupName}-{groupId})下共有{totalPages}页')
+        return totalPages
 
     def getWordsByPage(self, pageNo: int, groupName: str, groupId: int) -> [str]:
         wordList = []
@@ -89,7 +104,6 @@ class Eudict(AbstractDictionary):
             'start': pageNo * 100,
             'length': 100,
             'categoryid': groupId,
-            '_': int(time.time()) * 1000,
         }
         try:
             logger.info(f'获取单词本(f{groupName}-{groupId})第:{pageNo + 1}页')
@@ -99,7 +113,8 @@ class Eudict(AbstractDictionary):
                 data=data
             )
             wl = r.json()
-            wordList = list(set(word['uuid'] for word in wl['data']))
+            # 去重时保留返回顺序，增量获取依赖单词顺序
+            wordList = list(dict.fromkeys(word['uuid'] for word in wl['data']))
         except Exception as error:
             logger.exception(f'网络异常{error}')
         finally:
@@ -1,9 +1,9 @@
 import logging
 from math import ceil
+from threading import Lock
 import requests
 from bs4 import BeautifulSoup
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+from ..network import CachingAdapter, defaultRetries
 from ..misc import AbstractDictionary
 
 logger = logging.getLogger('dict2Anki.dictionary.youdao')
@@ -17,14 +17,22 @@ class Youdao(AbstractDictionary):
         'Host': 'dict.youdao.com',
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36',
     }
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', CachingAdapter(max_retries=retries))
+    session.mount('https://', CachingAdapter(max_retries=retries))
+    defaultPageSize = 15  # 网页默认每页15个
+    maxPageSize = 1000  # 探测每页数量时请求的上限
+    pageSize = None  # 探测到的服务端每页数量上限，所有实例共用
+    _pageSizeLock = Lock()
+    newestFirst = True  # 单词本按添加时间倒序返回，可以增量获取；顺序在获取时用首页和末页核对，不符时全部获取
 
     def __init__(self):
         self.indexSoup = None
         self.groups = []
+        self.groupPageSizes = dict()
+        self.groupTotalWords = dict()
+        self.groupFirstPages = dict()  # 探测每页数量时取到的第一页，获取第一页时直接使用
 
     def checkCookie(self, cookie: dict) -> bool:
         """
@@ -63,28 +71,79 @@ class Youdao(AbstractDictionary):
 
         return groups
 
+    def getTotalWords(self, groupName: str, groupId: int) -> int:
+        """
+        获取分组下单词总数，同一实例中每个分组只请求一次
+        :param groupName: 分组名称
+        :param groupId:分组id
+        :return: 单词总数，请求失败返回 None
+        """
+        if groupId not in self.groupTotalWords:
+            try:
+                r = self.session.get(
+                    url='http://dict.youdao.com/wordbook/webapi/words',
+                    timeout=self.timeout,
+                    params={'bookId': groupId, 'limit': 1, 'offset': 0}
+                )
+                self.groupTotalWords[groupId] = r.json()['data']['total']
+            except Exception as error:
+                logger.exception(f'网络异常{error}')
+                return None
+        return self.groupTotalWords[groupId]
+
     def getTotalPage(self, groupName: str, groupId: int) -> int:
         """
-        获取分组下总页数
+        获取分组下总页数，每次获取单词前调用，重新请求单词总数
         :param groupName: 分组名称
         :param groupId:分组id
         :return:
         """
-        try:
-            r = self.session.get(
-                url='http://dict.youdao.com/wordbook/webapi/words',
-                timeout=self.timeout,
-                params={'bookId': groupId, 'limit': 1, 'offset': 0}
-            )
-            totalWords = r.json()['data']['total']
-            totalPages = ceil(totalWords / 15)  # 这里按网页默认每页取15个
+        self.groupTotalWords.pop(groupId, None)
+        self.groupFirstPages.pop(groupId, None)
+        totalWords = self.getTotalWords(groupName, groupId)
+        if totalWords is None:
+            return None
+        pageSize = self.defaultPageSize if totalWords <= self.defaultPageSize else self.probePageSize(groupId, totalWords)
+        self.groupPageSizes[groupId] = pageSize
+        totalPages = ceil(totalWords / pageSize)
+        logger.info(f'该分组({groupName}-{groupId})下共有{totalWords}个单词，每页{pageSize}个，共{totalPages}页')
+        return totalPages
 
-        except Exception as error:
-            logger.exception(f'网络异常{error}')
+    def probePageSize(self, groupId: int, totalWords: int) -> int:
+        """
+        用分组的第一页探测 webapi 每页最多返回多少个单词
+        返回数量等于请求数量，或少于分组单词数时即为服务端上限，记录下来供之后的分组使用
+        按探测结果分页时探测的响应就是第一页，保存下来，不再重复请求
+        请求失败或返回异常时按网页默认每页15个
+        :param groupId: 分组id
+        :param totalWords: 分组单词数
+        :return: 该分组每页数量
+        """
+        with self._pageSizeLock:
+            if Youdao.pageSize:
+                return Youdao.pageSize
+            try:
+                r = self.session.get(
+                    'http://dict.youdao.com/wordbook/webapi/words',
+                    timeout=self.timeout,
+                    params={'bookId': groupId, 'limit': self.maxPageSize, 'offset': 0}
+                )
+                firstPage = [item['word'] for item in r.json()['data']['itemList']]
+                count = len(firstPage)
+            except Exception as e:
+                logger.warning(f'每页数量探测失败，按每页{self.defaultPageSize}个获取:{e}')
+                return self.defaultPageSize
 
-        else:
-            logger.info(f'该分组({groupName}-{groupId})下共有{totalPages}页')
-            return totalPages
+            if count == self.maxPageSize or self.defaultPageSize <= count < totalWords:
+                Youdao.pageSize = count
+                self.groupFirstPages[groupId] = firstPage
+                logger.info(f'每页最多获取{count}个单词')
+                return count
+            if count == totalWords:
+                self.groupFirstPages[groupId] = firstPage
+                return self.maxPageSize  # 一页即可取完该分组，服务端上限仍未知
+            logger.warning(f'每页数量探测结果异常({count}/{totalWords})，按每页{self.defaultPageSize}个获取')
+            return self.defaultPageSize
 
     def getWordsByPage(self, pageNo: int, groupName: str, groupId: str) -> [str]:
         """
@@ -94,13 +153,17 @@ class Youdao(AbstractDictionary):
         :param groupId: 分组id
         :return:
         """
+        if pageNo == 0 and groupId in self.groupFirstPages:
+            logger.info(f'单词本(f{groupName}-{groupId})第:{pageNo}页已在探测每页数量时获取')
+            return self.groupFirstPages.pop(groupId)
         wordList = []
         try:
             logger.info(f'获取单词本(f{groupName}-{groupId})第:{pageNo}页')
+            pageSize = self.groupPageSizes.get(groupId, self.defaultPageSize)
             r = self.session.get(
                 'http://dict.youdao.com/wordbook/webapi/words',
                 timeout=self.timeout,
-                params={'bookId': groupId, 'limit': 15, 'offset': pageNo * 15}
+                params={'bookId': groupId, 'limit': pageSize, 'offset': pageNo * pageSize}
             )
             wordList = [item['word'] for item in r.json()['data']['itemList']]
         except Exception as e:
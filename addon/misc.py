@@ -1,7 +1,16 @@
+import time
+import json
 import logging
+from collections import deque
+from functools import partial
+from operator import attrgetter
+from threading import Lock, BoundedSemaphore
 from queue import Queue
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, CancelledError
+from concurrent.futures.process import BrokenProcessPool
 from abc import ABC, abstractmethod
+from .constants import BASIC_OPTION
+from .throttle import AIMDController
 
 logger = logging.getLogger('dict2Anki.misc')
 
@@ -21,6 +30,10 @@ class AbstractDictionary(ABC):
     def getGroups(self) -> [(str, int)]:
         pass
 
+    @abstractmethod
+    def getTotalWords(self, groupName: str, groupId: int) -> int:
+        pass
+
     @abstractmethod
     def getTotalPage(self, groupName: str, groupId: int) -> int:
         pass
@@ -33,14 +46,177 @@ class AbstractDictionary(ABC):
 class AbstractQueryAPI(ABC):
     @classmethod
     @abstractmethod
-    def query(cls, word) -> dict:
+    def query(cls, word, fields=None) -> 'QueryResult':
         """
         查询
         :param word: 单词
-        :return: 查询结果 dict(term, definition, phrase, image, sentence, BrEPhonetic, AmEPhonetic, BrEPron, AmEPron)
+        :param fields: 需要的字段(BASIC_OPTION 中的名称)，只请求和解析这些字段，None 表示全部
+        :return: 查询结果 QueryResult，未请求的字段为 None
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def requestUrl(cls, word, fields=None) -> str:
+        """
+        查询请求地址，供不使用 cls.session 的查询引擎(如 asyncio)自行发送请求
+        :param word: 单词
+        :param fields: 需要的字段，同 query
+        :return: url
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def parse(cls, text, word, fields=None) -> 'QueryResult':
+        """
+        解析查询响应
+        :param text: 响应内容
+        :param word: 单词
+        :param fields: 需要的字段，同 query
+        :return: 查询结果，同 query
         """
         pass
 
+    @classmethod
+    def fetch(cls, word, fields=None) -> str:
+        """
+        发送查询请求，与 parse 分开，以便把解析交给进程池，并区分网络错误和解析失败
+        :param word: 单词
+        :param fields: 需要的字段，同 query
+        :return: 响应内容，网络错误或 HTTP 错误状态时抛出异常
+        """
+        rsp = cls.session.get(cls.requestUrl(word, fields), timeout=cls.timeout)
+        logger.debug(f'{cls.name} code:{rsp.status_code}- word:{word}')
+        rsp.raise_for_status()
+        return rsp.text
+
+    @classmethod
+    def queryMany(cls, words, fields=None, parse=None):
+        """
+        批量查询，按完成顺序逐个返回 (单词, 查询结果, 异常)
+        默认在共用线程池中并发 fetch 和 parse，并发数由该 API 的 AIMD 控制器调整
+        能批量查询的 API(离线词典、批量接口等)可以覆盖此方法
+        :param words: 单词序列，可以是边产生边查询的迭代器
+        :param fields: 需要的字段，同 query
+        :param parse: 代替 cls.parse 的解析函数，参数同 cls.parse(如交给解析进程池)
+        :return: 迭代器，请求失败时异常为请求抛出的异常，解析失败时为 ParseError，两者查询结果均为 None
+        """
+        controller = AIMDController.forApi(cls)
+        parse = parse or cls.parse
+
+        def queryOne(word):
+            start = time.perf_counter()
+            try:
+                text = cls.fetch(word, fields)
+            except Exception as e:
+                controller.record(time.perf_counter() - start, failed=True)
+                return word, None, e
+            controller.record(time.perf_counter() - start)
+            try:
+                return word, parse(text, word, fields), None
+            except BrokenProcessPool as e:
+                return word, None, e
+            except Exception as e:
+                error = ParseError(f'{cls.name} 解析失败:{word} {e!r}')
+                error.__cause__ = e
+                return word, None, error
+
+        return getExecutor().mapUnordered(queryOne, words, gate=controller)
+
+
+class ParseError(Exception):
+    """查询响应解析失败，与网络错误不同，重试也不会成功"""
+
+
+class QueryResult:
+    """
+    查询结果，各字段存放在 __slots__ 中，短语和例句为 ((原文, 译文), ...) 元组
+    保留 result['term']、result.get('definition') 的读取方式，兼容以 dict 返回结果的 API
+    """
+    FIELDS = ('term', 'definition', 'phrase', 'image', 'sentence', 'BrEPhonetic', 'AmEPhonetic', 'BrEPron', 'AmEPron')  # 顺序即序列化格式，不可修改
+    __slots__ = FIELDS
+    _getters = {name: attrgetter(name) for name in FIELDS}  # 字段名到读取函数，get 和 [] 只需一次字典查找
+
+    def __init__(self, term, definition=None, phrase=None, image=None, sentence=None, BrEPhonetic=None, AmEPhonetic=None, BrEPron=None, AmEPron=None):
+        self.term = term
+        self.definition = None if definition is None else tuple(definition)
+        self.phrase = self._pairs(phrase)
+        self.image = image
+        self.sentence = self._pairs(sentence)
+        self.BrEPhonetic = BrEPhonetic
+        self.AmEPhonetic = AmEPhonetic
+        self.BrEPron = BrEPron
+        self.AmEPron = AmEPron
+
+    @staticmethod
+    def _pairs(pairs) -> tuple:
+        return None if pairs is None else tuple((first, second) for first, second in pairs)
+
+    @classmethod
+    def of(cls, result) -> 'QueryResult':
+        """把 API 返回的 dict 转为 QueryResult，None 和 QueryResult 原样返回"""
+        if result is None or isinstance(result, cls):
+            return result
+        return cls(**{name: result.get(name) for name in cls.FIELDS})
+
+    def dumps(self) -> str:
+        """序列化为按 FIELDS 顺序排列的 JSON 数组，用于磁盘缓存"""
+        return json.dumps([getattr(self, name) for name in self.FIELDS], ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, text) -> 'QueryResult':
+        """反序列化，同时兼容旧版本缓存中的 dict"""
+        data = json.loads(text)
+        return cls.of(data) if isinstance(data, dict) else cls(*data)
+
+    def toDict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __getitem__(self, name):
+        getter = self._getters.get(name)
+        if getter is None:
+            raise KeyError(name)
+        return getter(self)
+
+    def get(self, name, default=None):
+        getter = self._getters.get(name)
+        return default if getter is None else getter(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, QueryResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    def __repr__(self):
+        return f'QueryResult({", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)})'
+
+
+def isEmptyResult(queryResult: QueryResult, fields=None) -> bool:
+    """
+    没有任何内容的查询结果(如拼写错误的单词)，未请求释义时无法判断，按有内容处理
+    :param queryResult: 查询结果
+    :param fields: 查询时请求的字段，None 表示全部
+    """
+    if fields is not None and 'definition' not in fields:
+        return False
+    return not any(queryResult.get(name) for name in BASIC_OPTION)
+
+
+class cachedProperty:
+    """只计算一次的 property，结果保存在实例上 (functools.cached_property 需要 Python 3.8)"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.name = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.fn(instance)
+        return value
+
 
 class Mask:
     def __init__(self, info):
@@ -53,47 +229,260 @@ class Mask:
         return self.info
 
 
-class Worker(Thread):
-    def __init__(self, queue, result_queue):
-        super(Worker, self).__init__()
-        self._q = queue
-        self.result_queue = result_queue
-        self.daemon = True
-        self.start()
+class ExecutorService:
+    """
+    插件共用的线程池，基于 concurrent.futures
+    提交队列有上限，map 按提交顺序返回结果，并统计每类任务的耗时
+    """
 
-    def run(self):
-        while True:
-            try:
-                f, args, kwargs = self._q.get()
-                result = f(*args, **kwargs)
-                if result:
-                    self.result_queue.put(result)
-            except Exception as e:
-                logger.exception(e)
-            finally:
-                self._q.task_done()
-
-
-class ThreadPool:
-    def __init__(self, max_workers):
-        self._q = Queue(max_workers)
-        self.results_q = Queue()
-        self.result = []
-        # Create Worker Thread
-        for _ in range(max_workers):
-            Worker(self._q, self.results_q)
-
-    def submit(self, f, *args, **kwargs):
-        self._q.put((f, args, kwargs))
-
-    def wait_complete(self):
-        self._q.join()
-        while not self.results_q.empty():
-            self.result.append(self.results_q.get())
-        return self.result
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.wait_complete()
\ No newline at end of file
+    def __init__(self, maxWorkers=16, maxPending=256, threadNamePrefix='dict2Anki'):
+        self._executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix=threadNamePrefix)
+        self._slots = BoundedSemaphore(maxWorkers + maxPending)
+        self._lock = Lock()
+        self._pending = set()
+        self._timings = dict()
+        self.isShutdown = False
+
+    def _timed(self, fn, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            name = getattr(fn, '__name__', repr(fn))
+            with self._lock:
+                count, total, longest = self._timings.get(name, (0, 0.0, 0.0))
+                self._timings[name] = (count + 1, total + elapsed, max(longest, elapsed))
+
+    def _onDone(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """提交任务，排队任务过多时阻塞调用方"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._timed, fn, args, kwargs)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._onDone)
+        return future
+
+    def map(self, fn, *iterables, maxInFlight=None, gate=None):
+        """
+        并发执行 fn 并按提交顺序返回结果
+        :param fn: 任务函数
+        :param iterables: 参数序列
+        :param maxInFlight: 同时执行的任务上限，None 表示只受线程池大小限制
+        :param gate: 自定义并发闸门(提供 acquire/release)，优先于 maxInFlight
+        :return: 结果迭代器，被取消的任务不返回结果
+        """
+        if gate is None and maxInFlight:
+            gate = BoundedSemaphore(maxInFlight)
+        futures = deque()
+        try:
+            for args in zip(*iterables):
+                if gate:
+                    gate.acquire()
+                try:
+                    future = self.submit(fn, *args)
+                except RuntimeError:  # 线程池已关闭，不再提交剩余任务
+                    # 闸门可能是进程内共用的 AIMD 控制器，未提交的任务也要归还名额
+                    if gate:
+                        gate.release()
+                    logger.warning('线程池已关闭，剩余任务取消')
+                    break
+                if gate:
+                    future.add_done_callback(lambda _: gate.release())
+                futures.append(future)
+                while futures and futures[0].done():
+                    future = futures.popleft()
+                    if not future.cancelled():
+                        yield future.result()
+            while futures:
+                future = futures.popleft()
+                try:
+                    yield future.result()
+                except CancelledError:
+                    pass
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def mapUnordered(self, fn, *iterables, maxInFlight=None, gate=None):
+        """
+        同 map，但按完成顺序返回结果，不会因为前面的慢任务而推迟已完成的结果
+        参数序列在调用方线程中读取，读取阻塞时已完成的结果也要等到下一次提交后返回
+        """
+        if gate is None and maxInFlight:
+            gate = BoundedSemaphore(maxInFlight)
+        completed = Queue()
+        pending = set()
+
+        def drain(block):
+            while pending and (block or not completed.empty()):
+                future = completed.get()
+                pending.discard(future)
+                if not future.cancelled():
+                    yield future.result()
+
+        try:
+            for args in zip(*iterables):
+                if gate:
+                    gate.acquire()
+                try:
+                    future = self.submit(fn, *args)
+                except RuntimeError:  # 线程池已关闭，不再提交剩余任务
+                    if gate:
+                        gate.release()
+                    logger.warning('线程池已关闭，剩余任务取消')
+                    break
+                pending.add(future)
+                if gate:
+                    future.add_done_callback(lambda _: gate.release())
+                future.add_done_callback(completed.put)
+                yield from drain(block=False)
+            yield from drain(block=True)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def logTimings(self):
+        """输出并清空任务耗时统计"""
+        with self._lock:
+            timings, self._timings = self._timings, dict()
+        for name, (count, total, longest) in timings.items():
+            logger.info(f'任务{name}: 共{count}次，平均耗时{total / count:.3f}s，最长{longest:.3f}s')
+
+    def shutdown(self, wait=True):
+        """取消尚未开始的任务并关闭线程池"""
+        self.isShutdown = True
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=wait)
+
+
+_executors = dict()
+_executorLock = Lock()
+
+
+def getExecutor(name='default', maxWorkers=16) -> ExecutorService:
+    """
+    获取共用线程池，关闭后再次获取会重新创建
+    :param name: 线程池名称，任务中还要等待其他任务时(如对冲查询)使用单独的线程池，避免占满同一个线程池造成死锁
+    :param maxWorkers: 新建线程池时的线程数
+    """
+    with _executorLock:
+        executor = _executors.get(name)
+        if executor is None or executor.isShutdown:
+            prefix = 'dict2Anki' if name == 'default' else f'dict2Anki-{name}'
+            executor = _executors[name] = ExecutorService(maxWorkers=maxWorkers, threadNamePrefix=prefix)
+        return executor
+
+
+def shutdownExecutor(wait=True):
+    """关闭所有共用线程池"""
+    with _executorLock:
+        executors = list(_executors.values())
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+def _parseResponse(api, text, word, fields):
+    return api.parse(text, word, fields)
+
+
+class ParserPool:
+    """
+    多进程解析查询响应，查询线程只负责收发请求
+    api 以模块路径传给子进程，需要能在子进程中导入
+    子进程意外退出后进程池不可再用(BrokenProcessPool)，此时重新创建进程池
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(max_workers=processes)
+        self._lock = Lock()
+        self.isShutdown = False
+
+    def _rebuild(self, broken):
+        """替换已损坏的进程池，多个线程同时发现时只重建一次"""
+        with self._lock:
+            if self._executor is not broken or self.isShutdown:
+                return
+            logger.warning('解析进程意外退出，重新创建解析进程池')
+            broken.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+
+    def _onDone(self, executor, future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._rebuild(executor)
+
+    def submit(self, api, text, word, fields=None) -> Future:
+        """
+        提交解析任务
+        :param api: 查询 API
+        :param text: 响应内容
+        :param word: 单词
+        :param fields: 需要的字段
+        :return: 结果为查询结果的 Future，进程池在任务执行中损坏时结果为 BrokenProcessPool 异常
+        """
+        executor = self._executor
+        try:
+            future = executor.submit(_parseResponse, api, text, word, fields)
+        except BrokenProcessPool:
+            self._rebuild(executor)
+            executor = self._executor
+            future = executor.submit(_parseResponse, api, text, word, fields)
+        future.add_done_callback(partial(self._onDone, executor))
+        return future
+
+    def parse(self, api, text, word, fields=None) -> dict:
+        try:
+            return self.submit(api, text, word, fields).result()
+        except BrokenProcessPool:
+            # 进程池已重建，重试一次
+            return self.submit(api, text, word, fields).result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self.isShutdown = True
+            executor = self._executor
+        executor.shutdown(wait=wait)
+
+
+_parserPool = None
+_parserPoolLock = Lock()
+
+
+def getParserPool(processes) -> ParserPool:
+    """
+    获取共用的解析进程池
+    :param processes: 进程数，为 0 时不使用进程池，在查询线程中解析
+    :return: 进程池，不使用时返回 None
+    """
+    global _parserPool
+    with _parserPoolLock:
+        if not processes:
+            return None
+        if _parserPool is None or _parserPool.isShutdown or _parserPool.processes != processes:
+            if _parserPool is not None:
+                _parserPool.shutdown(wait=False)
+            _parserPool = ParserPool(processes)
+            logger.info(f'使用{processes}个进程解析查询结果')
+        return _parserPool
+
+
+def shutdownParserPool(wait=True):
+    with _parserPoolLock:
+        if _parserPool is not None:
+            _parserPool.shutdown(wait=wait)
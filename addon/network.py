@@ -0,0 +1,123 @@
+import logging
+import sqlite3
+from urllib.parse import urlparse
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3 import Retry
+from .throttle import rateLimiter
+
+logger = logging.getLogger('dict2Anki.network')
+
+_httpCache = None
+
+
+def setHttpCache(cache):
+    """设置 CachingAdapter 使用的 HttpCache，为 None 时不缓存"""
+    global _httpCache
+    _httpCache = cache
+
+
+def evictHttpCache():
+    """一次获取或查询结束后淘汰超出大小的响应，并输出命中统计"""
+    if _httpCache is not None:
+        _httpCache.evict()
+
+
+class RateLimitedRetry(Retry):
+    """urllib3 在适配器内部重试，每次重试前同样向限速器领取令牌"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if _pool is not None:
+            rateLimiter.acquire(_pool.host)
+        return retry
+
+
+# 各词典、查询 API 和发音下载共用的重试设置，重试前依次等待 0、2、4、8、16 秒
+defaultRetries = RateLimitedRetry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    发送请求前经过进程内共用的按主机限速器，收到 429 时按 Retry-After 暂停该主机
+    max_retries 需为 RateLimitedRetry(或次数)，重试才会经过限速器
+    """
+
+    def __init__(self, max_retries=0, **kwargs):
+        if not isinstance(max_retries, Retry):
+            max_retries = RateLimitedRetry(max_retries, read=False) if max_retries == 0 else RateLimitedRetry.from_int(max_retries)
+        super().__init__(max_retries=max_retries, **kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname
+        rateLimiter.acquire(host)
+        response = super().send(request, **kwargs)
+        if response.status_code == 429:
+            try:
+                retryAfter = float(response.headers.get('Retry-After', 10))
+            except ValueError:
+                retryAfter = 10
+            rateLimiter.pause(host, retryAfter)
+        return response
+
+
+class CachingAdapter(RateLimitedAdapter):
+    """
+    条件请求：带 ETag 或 Last-Modified 的 GET 响应保存到 HttpCache
+    再次请求时附带 If-None-Match / If-Modified-Since，服务端返回 304 时使用缓存的响应
+    缓存读写失败(如数据库被锁)时只记录日志，按无缓存发送请求
+    """
+    # 缓存的是解压后的响应体，不保存与传输有关的头
+    droppedHeaders = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+    def send(self, request, **kwargs):
+        cache = _httpCache
+        if cache is None or request.method != 'GET' or kwargs.get('stream'):
+            return super().send(request, **kwargs)
+
+        key = cache.key(request)
+        try:
+            cached = cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f'读取 HTTP 缓存失败:{request.url} {e}')
+            cached = None
+        if cached:
+            if cached['etag']:
+                request.headers['If-None-Match'] = cached['etag']
+            if cached['lastModified']:
+                request.headers['If-Modified-Since'] = cached['lastModified']
+
+        response = super().send(request, **kwargs)
+        if cached and response.status_code == 304:
+            cache.countHit()
+            try:
+                cache.touch(key)
+            except sqlite3.Error as e:
+                logger.warning(f'更新 HTTP 缓存失败:{request.url} {e}')
+            logger.debug(f'HTTP 缓存有效:{request.url}')
+            return self.cachedResponse(request, response, cached)
+
+        cache.countMiss()
+        etag = response.headers.get('ETag')
+        lastModified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or lastModified):
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in self.droppedHeaders}
+            try:
+                cache.put(key, request.url, etag, lastModified, headers, response.content, response.encoding)
+            except sqlite3.Error as e:
+                logger.warning(f'写入 HTTP 缓存失败:{request.url} {e}')
+        return response
+
+    def cachedResponse(self, request, notModified, cached) -> Response:
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(cached['headers'])
+        response._content = cached['body']
+        response.encoding = cached['encoding']
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = notModified.elapsed
+        return response
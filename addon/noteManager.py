@@ -1,4 +1,5 @@
 from .constants import MODEL_FIELDS, BASIC_OPTION, EXTRA_OPTION
+from .misc import QueryResult
 import logging
 
 logger = logging.getLogger('dict2Anki.noteManager')
@@ -14,22 +15,72 @@ def getDeckList():
     return [deck['name'] for deck in mw.col.decks.all()]
 
 
-def getWordsByDeck(deckName) -> [str]:
-    notes = mw.col.findNotes(f'deck:"{deckName}"')
-    words = []
-    for nid in notes:
-        note = mw.col.getNote(nid)
-        if note.model().get('name', '').lower().startswith('dict2anki') and note['term']:
-            words.append(note['term'])
-    return words
+def _idsToStr(ids) -> str:
+    return '({})'.format(','.join(str(int(i)) for i in ids))
+
+
+def _deckIds(deckName) -> [int]:
+    """牌组及其子牌组的 id，与 findNotes 的 deck:"xxx" 搜索范围一致"""
+    deck = mw.col.decks.byName(deckName)
+    if not deck:
+        return []
+    return [deck['id']] + [did for _, did in mw.col.decks.children(deck['id'])]
+
+
+def _termFieldIndexes() -> dict:
+    """Dict2Anki 模版 id 到 term 字段序号的映射"""
+    indexes = dict()
+    for model in mw.col.models.all():
+        if not model.get('name', '').lower().startswith('dict2anki'):
+            continue
+        for field in model['flds']:
+            if field['name'] == 'term':
+                indexes[model['id']] = field['ord']
+    return indexes
+
+
+def _iterDeckTerms(deckName):
+    """
+    一次 SQL 查询获取牌组下全部 Dict2Anki 笔记
+    :param deckName: 牌组名称
+    :return: (note id, term) 迭代器
+    """
+    dids = _deckIds(deckName)
+    termIndexes = _termFieldIndexes()
+    if not dids or not termIndexes:
+        return
+
+    rows = mw.col.db.all(
+        'SELECT DISTINCT n.id, n.mid, n.flds FROM notes n JOIN cards c ON c.nid = n.id '
+        f'WHERE (c.did IN {_idsToStr(dids)} OR c.odid IN {_idsToStr(dids)}) AND n.mid IN {_idsToStr(termIndexes)}'
+    )
+    for nid, mid, flds in rows:
+        fields = flds.split('\x1f')
+        index = termIndexes[mid]
+        if index < len(fields) and fields[index]:
+            yield nid, fields[index]
+
+
+def getWordsByDeck(deckName) -> {str}:
+    return set(term for _, term in _iterDeckTerms(deckName))
 
 
 def getNotes(wordList, deckName) -> list:
+    """
+    一次查询出牌组下全部单词的 note id，再按单词批量匹配
+    与 getWordsByDeck 的范围一致：只匹配 Dict2Anki 模版的笔记，包含子牌组和筛选牌组中的卡片
+    单词按 term 字段精确匹配(区分大小写)，同一单词有多个笔记时全部返回，同步删除单词时重复的笔记一并删除
+    :param wordList: 单词列表
+    :param deckName: 牌组名称
+    :return: note id 列表
+    """
+    termToNids = dict()
+    for nid, term in _iterDeckTerms(deckName):
+        termToNids.setdefault(term, []).append(nid)
+
     notes = []
     for word in wordList:
-        note = mw.col.findNotes(f'deck:"{deckName}" term:"{word}"')
-        if note:
-            notes.append(note[0])
+        notes.extend(termToNids.get(word, []))
     return notes
 
 
@@ -120,36 +171,73 @@ def getOrCreateModelCardTemplate(modelObject, cardTemplateName):
     mw.col.models.add(modelObject)
 
 
-def addNoteToDeck(deckObject, modelObject, currentConfig: dict, oneQueryResult: dict):
-    if not oneQueryResult:
-        logger.warning(f'查询结果{oneQueryResult} 异常，忽略')
-        return
-    modelObject['did'] = deckObject['id']
-
+def _buildNote(modelObject, currentConfig: dict, oneQueryResult: QueryResult):
     newNote = anki.notes.Note(mw.col, modelObject)
-    newNote['term'] = oneQueryResult['term']
+    term = oneQueryResult.term
+    newNote['term'] = term
     for configName in BASIC_OPTION + EXTRA_OPTION:
-        logger.debug(f'字段:{configName}--结果:{oneQueryResult.get(configName)}')
-        if oneQueryResult.get(configName):
+        value = oneQueryResult.get(configName)
+        logger.debug(f'字段:{configName}--结果:{value}')
+        if value:
             # 短语例句
             if configName in ['sentence', 'phrase'] and currentConfig[configName]:
                 newNote[f'{configName}Front'] = '\n'.join(
-                    [f'<tr><td>{e.strip()}</td></tr>' for e, _ in oneQueryResult[configName]])
+                    [f'<tr><td>{e.strip()}</td></tr>' for e, _ in value])
                 newNote[f'{configName}Back'] = '\n'.join(
-                    [f'<tr><td>{e.strip()}<br>{c.strip()}</td></tr>' for e, c in oneQueryResult[configName]])
+                    [f'<tr><td>{e.strip()}<br>{c.strip()}</td></tr>' for e, c in value])
             # 图片
             elif configName == 'image':
-                newNote[configName] = f'src="{oneQueryResult[configName]}"'
+                newNote[configName] = f'src="{value}"'
             # 释义
             elif configName == 'definition' and currentConfig[configName]:
-                newNote[configName] = ' '.join(oneQueryResult[configName])
+                newNote[configName] = ' '.join(value)
             # 发音
             elif configName in EXTRA_OPTION[:2]:
-                newNote[configName] = f"[sound:{configName}_{oneQueryResult['term']}.mp3]"
+                newNote[configName] = f"[sound:{configName}_{term}.mp3]"
             # 其他
             elif currentConfig[configName]:
-                newNote[configName] = oneQueryResult[configName]
+                newNote[configName] = value
+    return newNote
+
+
+def addNoteToDeck(deckObject, modelObject, currentConfig: dict, oneQueryResult: QueryResult):
+    if not oneQueryResult:
+        logger.warning(f'查询结果{oneQueryResult} 异常，忽略')
+        return
+    modelObject['did'] = deckObject['id']
 
+    newNote = _buildNote(modelObject, currentConfig, oneQueryResult)
     mw.col.addNote(newNote)
     mw.col.reset()
     logger.info(f"添加笔记{newNote['term']}")
+
+
+def addNotesToDeck(deckObject, modelObject, currentConfig: dict, queryResults: [QueryResult]) -> int:
+    """
+    批量添加笔记，全部添加完成后只重置一次 collection
+    单个笔记添加失败时记录日志并继续，已添加的笔记保留，可通过撤销检查点一起撤销
+    :param deckObject: 牌组
+    :param modelObject: 模版
+    :param currentConfig: 当前设置
+    :param queryResults: 查询结果列表
+    :return: 添加的笔记数量
+    """
+    modelObject['did'] = deckObject['id']
+    mw.checkpoint('Dict2Anki 添加笔记')
+
+    added = 0
+    try:
+        for oneQueryResult in queryResults:
+            if not oneQueryResult:
+                logger.warning(f'查询结果{oneQueryResult} 异常，忽略')
+                continue
+            try:
+                mw.col.addNote(_buildNote(modelObject, currentConfig, oneQueryResult))
+            except Exception as e:
+                logger.exception(f'添加笔记{oneQueryResult.term}失败: {e}')
+                continue
+            added += 1
+    finally:
+        mw.col.reset()
+    logger.info(f'添加{added}个笔记')
+    return added
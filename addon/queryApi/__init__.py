@@ -1,3 +1,4 @@
 from . import youdao, bing, eudict
+from .hedged import HedgedAPI
 
-apis = [youdao.API, eudict.API]
+apis = [youdao.API, eudict.API, HedgedAPI.of(youdao.API, eudict.API)]
@@ -1,24 +1,33 @@
+import json
 import string
 import logging
 import requests
-from urllib3 import Retry
 from urllib.parse import urlencode
-from requests.adapters import HTTPAdapter
-from ..misc import AbstractQueryAPI
+from ..network import CachingAdapter, defaultRetries
+from ..misc import AbstractQueryAPI, QueryResult, cachedProperty
+from ..constants import BASIC_OPTION
 logger = logging.getLogger('dict2Anki.queryApi.bing')
 __all__ = ['API']
 
 
 class Parser:
-    def __init__(self, json_obj, term):
+    version = 1  # 解析结果格式变化时递增，使旧的查询缓存失效
+
+    def __init__(self, json_obj, term, fields=None):
+        """
+        :param json_obj: 查询结果
+        :param term: 单词
+        :param fields: 需要的字段，None 表示全部
+        """
         self._result = json_obj
         self.term = term
+        self.fields = BASIC_OPTION if fields is None else fields
 
-    @property
+    @cachedProperty
     def definition(self) -> list:
         return [''.join([d.get('pos', ''), d.get('def', '')]) for d in self._result.get('defs') or []]
 
-    @property
+    @cachedProperty
     def pronunciations(self) -> dict:
         return self._result.get('pronunciation') or dict()
 
@@ -42,7 +51,7 @@ class Parser:
         """美式发音url"""
         return self.pronunciations.get('AmEmp3')
 
-    @property
+    @cachedProperty
     def sentence(self) -> list:
         return [(s.get('eng'), s.get('chn'),) for s in self._result.get('sams') or []]
 
@@ -51,39 +60,46 @@ class Parser:
         return None
 
     @property
-    def result(self) -> dict:
-        return {
-            'term': self.term,
-            'definition': self.definition,
-            'phrase': None,
-            'image': self.image,
-            'sentence': self.sentence,
-            'BrEPhonetic': self.BrEPhonetic,
-            'AmEPhonetic': self.AmEPhonetic,
-            'BrEPron': self.BrEPron,
-            'AmEPron': self.AmEPron
-        }
+    def phrase(self) -> None:
+        return None
+
+    @cachedProperty
+    def result(self) -> QueryResult:
+        return QueryResult(
+            self.term,
+            **{name: getattr(self, name) if name in self.fields else None for name in BASIC_OPTION},
+            BrEPron=self.BrEPron,
+            AmEPron=self.AmEPron
+        )
 
 
 class API(AbstractQueryAPI):
     name = '必应 API'
     timeout = 10
     headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36'}
-    retries = Retry(total=5, backoff_factor=3, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', CachingAdapter(max_retries=retries))
+    session.mount('https://', CachingAdapter(max_retries=retries))
     url = 'http://xtk.azurewebsites.net/BingDictService.aspx'
     parser = Parser
 
     @classmethod
-    def query(cls, word) -> dict:
+    def requestUrl(cls, word, fields=None) -> str:
         validator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))  # 第三方Bing API查询包含标点的单词时有可能会报错，所以用空格替换所有标点
+        return f"{cls.url}?{urlencode({'Word': word.translate(validator)})}"
+
+    @classmethod
+    def parse(cls, text, word, fields=None) -> QueryResult:
+        return cls.parser(json.loads(text), word, fields).result
+
+    @classmethod
+    def query(cls, word, fields=None) -> QueryResult:
         query_result = None
         try:
-            rsp = cls.session.get(cls.url, params=urlencode({'Word': word.translate(validator)}), timeout=cls.timeout)
-            logger.debug(f'code:{rsp.status_code}- word:{word} text:{rsp.text}')
-            query_result = cls.parser(rsp.json(), word).result
+            text = cls.fetch(word, fields)
+            logger.debug(f'word:{word} text:{text}')
+            query_result = cls.parse(text, word, fields)
         except Exception as e:
             logger.exception(e)
         finally:
@@ -1,16 +1,78 @@
 import logging
 import requests
-from urllib3 import Retry
-from requests.adapters import HTTPAdapter
-from ..misc import AbstractQueryAPI
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from ..network import CachingAdapter, defaultRetries
+from ..misc import AbstractQueryAPI, QueryResult, cachedProperty
+from ..constants import BASIC_OPTION
+from bs4 import BeautifulSoup, SoupStrainer
+try:
+    import lxml  # noqa: F401
+    PARSER_BACKEND = 'lxml'
+except ImportError:
+    PARSER_BACKEND = 'html.parser'
+try:
+    from bs4.filter import ElementFilter  # bs4 >= 4.13
+except ImportError:
+    ElementFilter = None
 logger = logging.getLogger('dict2Anki.queryApi.eudict')
 __all__ = ['API']
 
+# 各字段用到的页面区域(id 或 class)，未用到的标签在建树前丢弃；发音总是需要
+FIELD_REGIONS = {
+    'definition': {'ExpFCChild'},
+    'sentence': {'ExpLJChild'},
+    'phrase': {'ExpSPECChild'},
+    'image': {'word-thumbnail-container'},
+}
+PRONUNCIATION_REGIONS = {'phonitic-line', 'gv_details'}
+
+
+@lru_cache(maxsize=None)
+def regionStrainer(fields: frozenset = None):
+    """
+    只保留需要的区域
+    :param fields: 需要的字段，None 表示全部
+    """
+    regions = set(PRONUNCIATION_REGIONS)
+    for field, fieldRegions in FIELD_REGIONS.items():
+        if fields is None or field in fields:
+            regions |= fieldRegions
+
+    def isRegion(name, attrs) -> bool:
+        attrs = attrs or dict()
+        classes = attrs.get('class') or ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        return attrs.get('id') in regions or not regions.isdisjoint(classes)
+
+    if ElementFilter is None:
+        # 旧版本 bs4 以 (标签名, 属性) 调用 SoupStrainer 的函数参数
+        return SoupStrainer(isRegion)
+
+    class RegionFilter(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return isRegion(name, attrs)
+
+        def allow_string_creation(self, string):
+            return False
+
+    return RegionFilter()
+
 
 class Parser:
-    def __init__(self, html, term):
-        self._soap = BeautifulSoup(html, 'html.parser')
+    version = 1  # 解析结果格式变化时递增，使旧的查询缓存失效
+
+    def __init__(self, html, term, fields=None, backend=PARSER_BACKEND, fullPage=False):
+        """
+        :param html: 查询页面
+        :param term: 单词
+        :param fields: 需要的字段，None 表示全部
+        :param backend: BeautifulSoup 解析器，默认有 lxml 时使用 lxml
+        :param fullPage: 解析整个页面，而不是只解析需要的区域
+        """
+        self.fields = BASIC_OPTION if fields is None else frozenset(fields)
+        parseOnly = None if fullPage else regionStrainer(None if fields is None else self.fields)
+        self._soap = BeautifulSoup(html, backend, parse_only=parseOnly)
         self.term = term
 
     @staticmethod
@@ -20,10 +82,10 @@ class Parser:
         else:
             return url
 
-    @property
+    @cachedProperty
     def definition(self) -> list:
         ret = []
-        div = self._soap.select('div #ExpFCChild')
+        div = self._soap.select('#ExpFCChild')
         if not div:
             return ret
 
@@ -47,7 +109,7 @@ class Parser:
 
         return ret
 
-    @property
+    @cachedProperty
     def pronunciations(self) -> dict:
         url = 'https://api.frdic.com/api/v2/speech/speakweb?'
         pron = {
@@ -67,7 +129,7 @@ class Parser:
 
         if not links:
             # 可能是只有一个发音的情况
-            links = self._soap.select('div .gv_details .voice-button')
+            links = self._soap.select('.gv_details .voice-button')
             # 返回两个相同的。下载只会按照用户选择下载一个，这样至少可以保证总是有发音
             links = [links[0], links[0]] if links else ''
 
@@ -113,9 +175,9 @@ class Parser:
         """美式发音url"""
         return self.pronunciations['AmEUrl']
 
-    @property
+    @cachedProperty
     def sentence(self) -> list:
-        els = self._soap.select('div #ExpLJChild .lj_item')
+        els = self._soap.select('#ExpLJChild .lj_item')
         ret = []
         for el in els:
             try:
@@ -127,9 +189,9 @@ class Parser:
                 pass
         return ret
 
-    @property
+    @cachedProperty
     def image(self) -> str:
-        els = self._soap.select('div .word-thumbnail-container img')
+        els = self._soap.select('.word-thumbnail-container img')
         ret = None
         if els:
             try:
@@ -140,9 +202,9 @@ class Parser:
                 pass
         return ret
 
-    @property
+    @cachedProperty
     def phrase(self) -> list:
-        els = self._soap.select('div #ExpSPECChild #phrase')
+        els = self._soap.select('#ExpSPECChild #phrase')
         ret = []
         for el in els:
             try:
@@ -153,39 +215,42 @@ class Parser:
                 pass
         return ret
 
-    @property
-    def result(self):
-        return {
-            'term': self.term,
-            'definition': self.definition,
-            'phrase': self.phrase,
-            'image': self.image,
-            'sentence': self.sentence,
-            'BrEPhonetic': self.BrEPhonetic,
-            'AmEPhonetic': self.AmEPhonetic,
-            'BrEPron': self.BrEPron,
-            'AmEPron': self.AmEPron
-        }
+    @cachedProperty
+    def result(self) -> QueryResult:
+        return QueryResult(
+            self.term,
+            **{name: getattr(self, name) if name in self.fields else None for name in BASIC_OPTION},
+            BrEPron=self.BrEPron,
+            AmEPron=self.AmEPron
+        )
 
 
 class API(AbstractQueryAPI):
     name = '欧陆词典 API'
     timeout = 10
     headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36'}
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', CachingAdapter(max_retries=retries))
+    session.mount('https://', CachingAdapter(max_retries=retries))
     url = 'https://dict.eudic.net/dicts/en/{}'
     parser = Parser
 
     @classmethod
-    def query(cls, word) -> dict:
+    def requestUrl(cls, word, fields=None) -> str:
+        return cls.url.format(word)
+
+    @classmethod
+    def parse(cls, text, word, fields=None) -> QueryResult:
+        return cls.parser(text, word, fields).result
+
+    @classmethod
+    def query(cls, word, fields=None) -> QueryResult:
         queryResult = None
         try:
-            rsp = cls.session.get(cls.url.format(word), timeout=cls.timeout)
-            logger.debug(f'code:{rsp.status_code}- word:{word} text:{rsp.text[:100]}')
-            queryResult = cls.parser(rsp.text, word).result
+            text = cls.fetch(word, fields)
+            logger.debug(f'word:{word} text:{text[:100]}')
+            queryResult = cls.parse(text, word, fields)
         except Exception as e:
             logger.exception(e)
         finally:
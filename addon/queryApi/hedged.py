@@ -0,0 +1,122 @@
+import time
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+from ..misc import AbstractQueryAPI, QueryResult, isEmptyResult, getExecutor
+from ..throttle import AIMDController
+logger = logging.getLogger('dict2Anki.queryApi.hedged')
+__all__ = ['HedgedAPI']
+
+
+class HedgedAPI(AbstractQueryAPI):
+    """
+    对冲查询：主 API 超过其 p90 延迟仍未返回时同时请求备用 API，使用先返回的完整结果
+    主 API 请求失败、解析失败或没有结果时直接改用备用 API
+    由 HedgedAPI.of(主 API, 备用 API) 生成，两个 API 的解析结果格式需一致
+    """
+    primary = None
+    secondary = None
+    asyncCapable = False  # 没有单一的请求地址，不能用于 asyncio 查询引擎
+    parseInPool = False  # 主备 API 在对冲线程中已解析完成
+    defaultHedgeDelay = 2.0  # 主 API 还没有延迟数据时的对冲等待(秒)
+    minHedgeDelay = 0.2
+    maxWorkers = 24
+
+    @classmethod
+    def of(cls, primary, secondary) -> type:
+        """
+        :param primary: 主 API
+        :param secondary: 备用 API
+        """
+        parser = type('Parser', (), {'version': primary.parser.version * 100 + secondary.parser.version})
+        return type(f'Hedged{primary.__module__.rsplit(".", 1)[-1].title()}API', (cls,), {
+            'name': f'{primary.name}(备用{secondary.name})',
+            'primary': primary,
+            'secondary': secondary,
+            'timeout': max(primary.timeout, secondary.timeout),
+            'parser': parser,
+        })
+
+    @classmethod
+    def hedgeDelay(cls) -> float:
+        """等待主 API 多久后请求备用 API"""
+        p90 = AIMDController.forApi(cls.primary).percentile(0.9)
+        return cls.defaultHedgeDelay if p90 is None else max(cls.minHedgeDelay, p90)
+
+    @staticmethod
+    def _query(api, word, fields) -> QueryResult:
+        """请求并解析，网络错误时抛出异常，解析失败时返回 None"""
+        controller = AIMDController.forApi(api)
+        start = time.perf_counter()
+        try:
+            text = api.fetch(word, fields)
+        except Exception:
+            controller.record(time.perf_counter() - start, failed=True)
+            raise
+        controller.record(time.perf_counter() - start)
+        try:
+            return QueryResult.of(api.parse(text, word, fields))
+        except Exception as e:
+            logger.warning(f'{api.name} 解析失败:{word} {e}')
+            return None
+
+    @staticmethod
+    def _complete(future, fields) -> bool:
+        return future.done() and future.exception() is None and bool(future.result()) and not isEmptyResult(future.result(), fields)
+
+    @classmethod
+    def hedgedQuery(cls, word, fields=None) -> QueryResult:
+        """
+        返回先得到的完整结果；没有完整结果且有 API 请求失败时抛出该网络异常(先主后备)，按暂时性失败处理
+        两个 API 都确实没有结果时返回空结果，都解析失败时返回 None，查询线程据此记入无结果缓存
+        :param word: 单词
+        :param fields: 需要的字段，None 表示全部
+        """
+        # 单独的线程池，避免在共用线程池的任务中再等待共用线程池造成死锁，随 shutdownExecutor 一起关闭
+        executor = getExecutor('hedge', maxWorkers=cls.maxWorkers)
+        futures = [executor.submit(cls._query, cls.primary, word, fields)]
+        wait(futures, timeout=cls.hedgeDelay())
+        if not cls._complete(futures[0], fields):
+            logger.info(f'{cls.primary.name} 未及时返回或没有结果，同时查询{cls.secondary.name}:{word}')
+            futures.append(executor.submit(cls._query, cls.secondary, word, fields))
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in futures:
+                if future in done and cls._complete(future, fields):
+                    return future.result()
+
+        # 请求失败的 API 可能有结果，不能把空结果或解析失败当作确定的结果，否则单词会被记入无结果缓存
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+        return next((future.result() for future in futures if future.exception() is None and future.result()), None)
+
+    @classmethod
+    def requestUrl(cls, word, fields=None) -> str:
+        """
+        主 API 的请求地址，不经过对冲
+        对冲查询没有单一的请求地址，fetch 不使用此地址，asyncCapable 为 False 时 asyncio 查询引擎也不会使用
+        """
+        return cls.primary.requestUrl(word, fields)
+
+    @classmethod
+    def fetch(cls, word, fields=None) -> str:
+        """查询结果序列化后作为响应，查询线程按普通 API 的方式解析、缓存"""
+        queryResult = cls.hedgedQuery(word, fields)
+        return 'null' if queryResult is None else queryResult.dumps()
+
+    @classmethod
+    def parse(cls, text, word, fields=None) -> QueryResult:
+        return None if text == 'null' else QueryResult.loads(text)
+
+    @classmethod
+    def query(cls, word, fields=None) -> QueryResult:
+        queryResult = None
+        try:
+            queryResult = cls.hedgedQuery(word, fields)
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            logger.debug(queryResult)
+            return queryResult
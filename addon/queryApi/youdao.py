@@ -1,19 +1,28 @@
+import json
 import logging
 import requests
-from urllib3 import Retry
 from urllib.parse import urlencode
-from requests.adapters import HTTPAdapter
-from ..misc import AbstractQueryAPI
+from ..network import CachingAdapter, defaultRetries
+from ..misc import AbstractQueryAPI, QueryResult, cachedProperty
+from ..constants import BASIC_OPTION
 logger = logging.getLogger('dict2Anki.queryApi.youdao')
 __all__ = ['API']
 
 
 class Parser:
-    def __init__(self, json_obj, term):
+    version = 1  # 解析结果格式变化时递增，使旧的查询缓存失效
+
+    def __init__(self, json_obj, term, fields=None):
+        """
+        :param json_obj: 查询结果
+        :param term: 单词
+        :param fields: 需要的字段，None 表示全部
+        """
         self._result = json_obj
         self.term = term
+        self.fields = BASIC_OPTION if fields is None else fields
 
-    @property
+    @cachedProperty
     def definition(self) -> list:
         try:
             ec = [d['tr'][0]['l']['i'][0] for d in self._result['ec']['word'][0]['trs']][:3]
@@ -33,7 +42,7 @@ class Parser:
             web_trans = []
         return ec if ec else web_trans
 
-    @property
+    @cachedProperty
     def pronunciations(self) -> dict:
         url = 'http://dict.youdao.com/dictvoice?audio='
         pron = {
@@ -84,21 +93,21 @@ class Parser:
         """美式发音url"""
         return self.pronunciations['AmEUrl']
 
-    @property
+    @cachedProperty
     def sentence(self) -> list:
         try:
             return [(s['sentence'], s['sentence-translation'],) for s in self._result['blng_sents_part']['sentence-pair']]
         except KeyError:
             return []
 
-    @property
+    @cachedProperty
     def image(self)->str:
         try:
             return [i['image'] for i in self._result['pic_dict']['pic']][0]
         except (KeyError, IndexError):
             return None
 
-    @property
+    @cachedProperty
     def phrase(self) -> list:
         phrase = self._result.get('phrs', dict()).get('phrs', [])
         return [
@@ -109,40 +118,63 @@ class Parser:
             for p in phrase if phrase
         ]
 
-    @property
-    def result(self):
-        return {
-            'term': self.term,
-            'definition': self.definition,
-            'phrase': self.phrase,
-            'image': self.image,
-            'sentence': self.sentence,
-            'BrEPhonetic': self.BrEPhonetic,
-            'AmEPhonetic': self.AmEPhonetic,
-            'BrEPron': self.BrEPron,
-            'AmEPron': self.AmEPron
-        }
+    @cachedProperty
+    def result(self) -> QueryResult:
+        return QueryResult(
+            self.term,
+            **{name: getattr(self, name) if name in self.fields else None for name in BASIC_OPTION},
+            BrEPron=self.BrEPron,
+            AmEPron=self.AmEPron
+        )
 
 
 class API(AbstractQueryAPI):
     name = '有道 API'
     timeout = 10
     headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36'}
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', CachingAdapter(max_retries=retries))
+    session.mount('https://', CachingAdapter(max_retries=retries))
     url = 'https://dict.youdao.com/jsonapi'
     params = {"dicts": {"count": 99, "dicts": [["ec", "ee", "phrs", "pic_dict"], ["web_trans"], ["fanyi"], ["blng_sents_part"]]}}
+    # 各字段需要请求的词典，音标和发音在每个响应都有的 simple 中
+    fieldDicts = {
+        'definition': {'ec', 'ee', 'web_trans', 'fanyi'},
+        'phrase': {'phrs'},
+        'image': {'pic_dict'},
+        'sentence': {'blng_sents_part'},
+    }
     parser = Parser
 
     @classmethod
-    def query(cls, word) -> dict:
+    def paramsFor(cls, fields=None) -> dict:
+        """
+        只请求需要的字段用到的词典，至少请求 ec 避免 dicts 为空
+        :return: 请求参数，dicts 为 JSON 字符串
+        """
+        dicts = cls.params['dicts']
+        if fields is not None:
+            wanted = {'ec'}.union(*[cls.fieldDicts.get(field, set()) for field in fields])
+            groups = [[d for d in group if d in wanted] for group in dicts['dicts']]
+            dicts = dict(dicts, dicts=[group for group in groups if group])
+        return {'dicts': json.dumps(dicts, separators=(',', ':'))}
+
+    @classmethod
+    def requestUrl(cls, word, fields=None) -> str:
+        return f"{cls.url}?{urlencode(dict(cls.paramsFor(fields), **{'q': word}))}"
+
+    @classmethod
+    def parse(cls, text, word, fields=None) -> QueryResult:
+        return cls.parser(json.loads(text), word, fields).result
+
+    @classmethod
+    def query(cls, word, fields=None) -> QueryResult:
         queryResult = None
         try:
-            rsp = cls.session.get(cls.url, params=urlencode(dict(cls.params, **{'q': word})), timeout=cls.timeout)
-            logger.debug(f'code:{rsp.status_code}- word:{word} text:{rsp.text}')
-            queryResult = cls.parser(rsp.json(), word).result
+            text = cls.fetch(word, fields)
+            logger.debug(f'word:{word} text:{text}')
+            queryResult = cls.parse(text, word, fields)
         except Exception as e:
             logger.exception(e)
         finally:
@@ -0,0 +1,178 @@
+import time
+import logging
+from collections import deque
+from threading import Lock, Condition
+
+logger = logging.getLogger('dict2Anki.throttle')
+
+
+class AIMDController:
+    """
+    AIMD 并发控制
+    延迟和错误率正常时每完成一轮(当前并发数个)请求并发数加一，出现失败、错误率或 p95 延迟超标时并发数减半
+    acquire/release 用于占用和归还并发名额，record 用于反馈每次请求的结果
+    """
+    _controllers = dict()
+    _registryLock = Lock()
+
+    def __init__(self, name='', initial=3, minimum=1, maximum=12, latencyTarget=3.0, errorRateLimit=0.1, window=50):
+        """
+        :param name: 名称，用于日志
+        :param initial: 初始并发数
+        :param minimum: 最小并发数
+        :param maximum: 最大并发数
+        :param latencyTarget: p95 延迟上限(秒)
+        :param errorRateLimit: 错误率上限
+        :param window: 统计最近多少次请求
+        """
+        self.name = name
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latencyTarget = latencyTarget
+        self.errorRateLimit = errorRateLimit
+        self._cond = Condition()
+        self._inFlight = 0
+        self._latencies = deque(maxlen=window)
+        self._failures = deque(maxlen=window)
+        self._successStreak = 0
+        self._lastDecrease = 0.0
+
+    @classmethod
+    def forApi(cls, api) -> 'AIMDController':
+        """每个查询 API 共用一个控制器，多次查询之间保留调整后的并发数"""
+        with cls._registryLock:
+            if api not in cls._controllers:
+                cls._controllers[api] = cls(name=api.name)
+            return cls._controllers[api]
+
+    def acquire(self):
+        with self._cond:
+            while self._inFlight >= self.limit:
+                self._cond.wait()
+            self._inFlight += 1
+
+    def release(self):
+        with self._cond:
+            self._inFlight -= 1
+            self._cond.notify_all()
+
+    def percentile(self, p) -> float:
+        """最近请求延迟的百分位数，没有数据时返回 None"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    def _unhealthy(self) -> bool:
+        if len(self._latencies) < 10:
+            return False
+        latencies = sorted(self._latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        errorRate = sum(self._failures) / len(self._failures)
+        return p95 > self.latencyTarget or errorRate > self.errorRateLimit
+
+    def record(self, elapsed, failed=False):
+        """
+        反馈一次请求结果
+        :param elapsed: 请求耗时(秒)
+        :param failed: 是否失败(超时、限流、服务端错误等)
+        """
+        with self._cond:
+            self._latencies.append(elapsed)
+            self._failures.append(failed)
+            if failed or self._unhealthy():
+                self._successStreak = 0
+                now = time.monotonic()
+                # 同一批请求的失败只减一次，避免并发数被连续减到最小
+                if now - self._lastDecrease > max(1.0, elapsed) and self.limit > self.minimum:
+                    self._lastDecrease = now
+                    self.limit = max(self.minimum, self.limit // 2)
+                    logger.info(f'{self.name} 请求异常，并发数降为{self.limit}')
+            else:
+                self._successStreak += 1
+                if self._successStreak >= self.limit and self.limit < self.maximum:
+                    self._successStreak = 0
+                    self.limit += 1
+                    logger.debug(f'{self.name} 并发数升为{self.limit}')
+            self._cond.notify_all()
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        :param rate: 每秒补充的令牌数
+        :param burst: 令牌桶容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._pausedUntil = 0.0
+
+    def reserve(self) -> float:
+        """预定一个令牌，返回需要等待的秒数(非线程安全，由 RateLimiter 加锁)"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+        # 暂停结束后，排队的请求仍按速率依次发出
+        return max(0.0, self._pausedUntil - now) + wait
+
+    def pause(self, seconds):
+        self._tokens = min(self._tokens, 0)
+        self._pausedUntil = max(self._pausedUntil, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    按主机限速，进程内所有 session 共用
+    超出速率的请求在发送前等待，而不是等服务端限流后再由 urllib3 长时间退避重试
+    """
+
+    def __init__(self, rate=10, burst=10):
+        self.rate = rate
+        self.burst = burst
+        self.hostRules = dict()
+        self._buckets = dict()
+        self._lock = Lock()
+
+    def configure(self, config: dict):
+        """
+        读取 config.json 中的 rateLimit 配置
+        :param config: {'rate': 每秒请求数, 'burst': 突发请求数, 'hosts': {主机: {'rate': x, 'burst': y}}}
+        """
+        config = config or dict()
+        with self._lock:
+            self.rate = config.get('rate', self.rate)
+            self.burst = config.get('burst', self.burst)
+            self.hostRules = config.get('hosts') or dict()
+            self._buckets.clear()
+        logger.info(f'请求限速:默认每秒{self.rate}次，突发{self.burst}次，{self.hostRules}')
+
+    def _bucket(self, host) -> TokenBucket:
+        if host not in self._buckets:
+            rule = self.hostRules.get(host) or dict()
+            self._buckets[host] = TokenBucket(rule.get('rate', self.rate), rule.get('burst', self.burst))
+        return self._buckets[host]
+
+    def reserve(self, host) -> float:
+        """预定一次请求，返回需要等待的秒数，供不能阻塞的调用方自行等待"""
+        with self._lock:
+            return self._bucket(host).reserve()
+
+    def acquire(self, host):
+        wait = self.reserve(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, host, seconds):
+        """服务端限流时暂停该主机的请求"""
+        logger.warning(f'{host} 限流，暂停{seconds}秒')
+        with self._lock:
+            self._bucket(host).pause(seconds)
+
+
+rateLimiter = RateLimiter()
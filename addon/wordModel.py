@@ -0,0 +1,117 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QIcon
+
+__all__ = ['WordListModel']
+
+
+class WordListModel(QAbstractListModel):
+    """
+    单词列表模型，单词、状态和查询结果保存在 Python 列表中，视图只读取可见的行
+    替代逐个创建 QListWidgetItem 的 QListWidget，查询结果也不再复制成 QVariant
+    """
+    NONE, WAIT, DONE, FAILED, DELETE = range(5)
+    ICONS = {WAIT: ':/icons/wait.png', DONE: ':/icons/done.png', FAILED: ':/icons/failed.png', DELETE: ':/icons/delete.png'}
+
+    def __init__(self, parent=None, checkable=False):
+        """
+        :param parent: 父对象
+        :param checkable: 每行带复选框，新加入的单词默认勾选
+        """
+        super().__init__(parent)
+        self.checkable = checkable
+        self.words = []
+        self.statuses = []
+        self.results = []
+        self.checked = []
+        self._icons = dict()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.words)
+
+    def _icon(self, status):
+        if status not in self._icons:
+            self._icons[status] = QIcon(self.ICONS[status])
+        return self._icons[status]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return self.words[row]
+        if role == Qt.DecorationRole and self.statuses[row] != self.NONE:
+            return self._icon(self.statuses[row])
+        if role == Qt.CheckStateRole and self.checkable:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.CheckStateRole or not self.checkable:
+            return False
+        self.checked[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if self.checkable:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def setWords(self, words, status=NONE):
+        """替换全部单词"""
+        self.beginResetModel()
+        self.words = list(words)
+        self.statuses = [status] * len(self.words)
+        self.results = [None] * len(self.words)
+        self.checked = [True] * len(self.words)
+        self.endResetModel()
+
+    def appendWords(self, words, status=NONE):
+        """在末尾批量加入单词，只通知视图一次"""
+        words = list(words)
+        if not words:
+            return
+        first = len(self.words)
+        self.beginInsertRows(QModelIndex(), first, first + len(words) - 1)
+        self.words.extend(words)
+        self.statuses.extend([status] * len(words))
+        self.results.extend([None] * len(words))
+        self.checked.extend([True] * len(words))
+        self.endInsertRows()
+
+    def clear(self):
+        self.setWords([])
+
+    def _rowsChanged(self, rows, roles):
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), roles)
+
+    def setResults(self, rowResults: [tuple]):
+        """
+        批量写入查询结果
+        :param rowResults: [(行号, 查询结果)]
+        """
+        for row, result in rowResults:
+            self.results[row] = result
+            self.statuses[row] = self.DONE
+        self._rowsChanged([row for row, _ in rowResults], [Qt.DecorationRole])
+
+    def setFailed(self, rows: [int]):
+        for row in rows:
+            self.statuses[row] = self.FAILED
+        self._rowsChanged(rows, [Qt.DecorationRole])
+
+    def checkedWords(self) -> list:
+        return [word for word, checked in zip(self.words, self.checked) if checked]
+
+    def removeWords(self, words):
+        """删除指定的单词"""
+        words = set(words)
+        keep = [row for row, word in enumerate(self.words) if word not in words]
+        self.beginResetModel()
+        self.words = [self.words[row] for row in keep]
+        self.statuses = [self.statuses[row] for row in keep]
+        self.results = [self.results[row] for row in keep]
+        self.checked = [self.checked[row] for row in keep]
+        self.endResetModel()
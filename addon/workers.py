@@ -1,13 +1,29 @@
 import json
+import sqlite3
+import asyncio
 import logging
 import requests
-from urllib3 import Retry
+from queue import Queue
+from functools import partial
+from collections import defaultdict, deque
 from itertools import chain
-from .misc import ThreadPool
-from requests.adapters import HTTPAdapter
+from typing import NamedTuple
+from threading import Lock, Thread, Event
+from urllib.parse import urlparse
+from concurrent.futures.process import BrokenProcessPool
+from .misc import getExecutor, isEmptyResult, ParseError, QueryResult
+from .network import RateLimitedAdapter, evictHttpCache, defaultRetries
+from .throttle import rateLimiter
 from .constants import VERSION, VERSION_CHECK_API
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger('dict2Anki.workers')
+
 
 class VersionCheckWorker(QObject):
     haveNewVersion = pyqtSignal(str, str)
@@ -51,87 +67,540 @@ class LoginStateCheckWorker(QObject):
             self.logFailed.emit()
 
 
+class SignalBatcher:
+    """
+    合并工作线程发往界面的信号：进度和各行结果先累积，由后台线程每隔 interval 秒统一发送一次
+    上万个单词时每个单词一次跨线程信号会让界面卡顿，也拖慢工作线程
+    用 with 包裹任务，退出时发送剩余的部分
+    """
+
+    def __init__(self, worker: QObject, interval=0.05):
+        """
+        :param worker: 发送信号的对象，计数信号参数为 int，批量信号参数为 list
+        :param interval: 发送间隔(秒)
+        """
+        self.worker = worker
+        self.interval = interval
+        self._lock = Lock()
+        self._counts = dict()
+        self._items = dict()
+        self._stopped = Event()
+        self._thread = None
+
+    def count(self, signalName, n=1):
+        if not n:
+            return
+        with self._lock:
+            self._counts[signalName] = self._counts.get(signalName, 0) + n
+
+    def append(self, signalName, item):
+        with self._lock:
+            self._items.setdefault(signalName, []).append(item)
+
+    def flush(self):
+        # 在锁内发送，保证后台线程和工作线程的两次发送不会交错
+        with self._lock:
+            for signalName, n in self._counts.items():
+                getattr(self.worker, signalName).emit(n)
+            for signalName, items in self._items.items():
+                getattr(self.worker, signalName).emit(items)
+            self._counts = dict()
+            self._items = dict()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def __enter__(self):
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name='dict2Anki-signalBatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+
+def _unique(words) -> list:
+    return list(dict.fromkeys(words))
+
+
+def diffWords(localWords, remoteWords) -> tuple:
+    """
+    比较本地和远程单词
+    :param localWords: 本地单词
+    :param remoteWords: 远程单词，可以有重复
+    :return: (新单词, 需要删除的单词, 未变化的单词)，新单词按远程顺序，其余按本地顺序
+    """
+    localSet = set(localWords)
+    remoteSet = set(remoteWords)
+    newWords = [word for word in _unique(remoteWords) if word not in localSet]
+    deletedWords = [word for word in _unique(localWords) if word not in remoteSet]
+    unchangedWords = [word for word in _unique(localWords) if word in remoteSet]
+    logger.info(f'本地{len(localSet)}个单词，远程{len(remoteSet)}个单词，待查{len(newWords)}个，待删{len(deletedWords)}个')
+    logger.debug(f'待查: {newWords}')
+    logger.debug(f'待删: {deletedWords}')
+    return newWords, deletedWords, unchangedWords
+
+
+def pullGroupIncrementally(selectedDict, groupName, groupId, totalPage, snapshot: dict, pullPage):
+    """
+    从最新的一页开始获取，词典按添加时间倒序返回时新单词都在快照单词之前
+    遇到第一个已知单词即可核对：新单词数与单词总数的变化一致，已获取的单词与快照顺序一致，且最后一页与快照末尾一致
+    有单词被删除时新单词数多于总数变化，词典并非倒序时新单词出现在末页，两种情况都放弃增量获取
+    :return: (分组全部单词, {页号: 已获取的单词})，放弃时单词为 None，调用方只需获取其余页
+    """
+    pages = dict()
+    totalWords = selectedDict.getTotalWords(groupName, groupId)
+    if totalWords is None or totalWords < snapshot['total']:
+        return None, pages
+
+    known = set(snapshot['words'])
+    pulled = []
+    for pageNo in range(totalPage):
+        page = pullPage(pageNo, groupName, groupId)
+        if not page:
+            return None, pages
+        pages[pageNo] = page
+        pulled.extend(page)
+        if all(word not in known for word in page):
+            continue
+
+        pulled = _unique(pulled)
+        newWords = [word for word in pulled if word not in known]
+        words = _unique(newWords + snapshot['words'])
+        if len(newWords) != totalWords - snapshot['total'] or len(words) != totalWords or pulled != words[:len(pulled)]:
+            return None, pages
+        lastPageNo = totalPage - 1
+        if lastPageNo not in pages:
+            pages[lastPageNo] = pullPage(lastPageNo, groupName, groupId)
+        lastPage = _unique(pages[lastPageNo])
+        if not lastPage or words[-len(lastPage):] != lastPage:
+            return None, pages
+        return words, pages
+
+    words = _unique(pulled)
+    return (words if len(words) == totalWords else None), pages
+
+
+def pullGroups(selectedDict, selectedGroups: [tuple], pullPage, onTotalPage=None, maxInFlight=6, snapshots=None, onSnapshotWords=None):
+    """
+    并发获取所有分组的页数，再把所有分组的每一页提交到共用线程池
+    :param selectedDict: 词典
+    :param selectedGroups: [(分组名, 分组id)]
+    :param pullPage: 获取一页单词 (pageNo, groupName, groupId) -> [str]
+    :param onTotalPage: 获取到全部分组的页数后调用，参数为总页数
+    :param maxInFlight: 同时进行的请求数上限，请求速率另由 rateLimiter 按主机限制
+    :param snapshots: 分组快照(SnapshotStore)，不为 None 时增量获取并在获取完整后更新快照
+    :param onSnapshotWords: 增量获取时，取自快照而未经过 pullPage 的单词和跳过的页数 (words, skippedPages)
+    :return: 按分组顺序返回 (分组名, 单词列表)，每个分组获取完毕即返回
+    """
+    def _getTotalPage(groupName, groupId):
+        return selectedDict.getTotalPage(groupName, groupId) or 0
+
+    def _pullIncrementally(groupName, groupId, totalPage):
+        snapshot = snapshots.get(selectedDict.name, groupId)
+        if not snapshot:
+            return None, dict()
+        words, pages = pullGroupIncrementally(selectedDict, groupName, groupId, totalPage, snapshot, pullPage)
+        if words is None:
+            logger.info(f'分组{groupName}与快照不一致，获取其余{totalPage - len(pages)}页')
+            return None, pages
+        logger.info(f'分组{groupName}增量获取{len(pages)}/{totalPage}页')
+        snapshots.put(selectedDict.name, groupId, words)
+        if onSnapshotWords:
+            pulledWords = set(chain(*pages.values()))
+            onSnapshotWords([word for word in words if word not in pulledWords], totalPage - len(pages))
+        return words, pages
+
+    executor = getExecutor()
+    totalPages = list(executor.map(_getTotalPage, *zip(*selectedGroups), maxInFlight=maxInFlight))
+    if onTotalPage:
+        onTotalPage(sum(totalPages))
+
+    pulled = [(None, dict())] * len(selectedGroups)
+    if snapshots is not None and getattr(selectedDict, 'newestFirst', False):
+        pulled = list(executor.map(_pullIncrementally, *zip(*selectedGroups), totalPages, maxInFlight=maxInFlight))
+
+    # 增量获取放弃时已获取的页不再重复获取
+    jobs = [
+        (pageNo, groupName, groupId)
+        for (groupName, groupId), totalPage, (words, pulledPages) in zip(selectedGroups, totalPages, pulled)
+        if words is None
+        for pageNo in range(totalPage)
+        if pageNo not in pulledPages
+    ]
+    pages = executor.map(pullPage, *zip(*jobs), maxInFlight=maxInFlight)
+    for (groupName, groupId), totalPage, (words, pulledPages) in zip(selectedGroups, totalPages, pulled):
+        if words is None:
+            groupPages = [pulledPages[pageNo] if pageNo in pulledPages else next(pages, None) for pageNo in range(totalPage)]
+            words = list(chain(*[page for page in groupPages if page]))
+            if snapshots is not None and len(set(words)) == selectedDict.getTotalWords(groupName, groupId):
+                snapshots.put(selectedDict.name, groupId, _unique(words))
+        yield groupName, words
+
+
 class RemoteWordFetchingWorker(QObject):
     start = pyqtSignal()
-    tick = pyqtSignal()
+    tick = pyqtSignal(int)
     setProgress = pyqtSignal(int)
     done = pyqtSignal()
     doneThisGroup = pyqtSignal(list)
+    diffDone = pyqtSignal(list, list, list)  # 新单词, 需要删除的单词, 未变化的单词
     logger = logging.getLogger('dict2Anki.workers.RemoteWordFetchingWorker')
 
-    def __init__(self, selectedDict, selectedGroups: [tuple]):
+    def __init__(self, selectedDict, selectedGroups: [tuple], snapshots=None, localWords=()):
+        """
+        :param selectedDict: 词典
+        :param selectedGroups: [(分组名, 分组id)]
+        :param snapshots: 分组快照，不为 None 时增量获取
+        :param localWords: 本地单词，全部获取完毕后在工作线程中与远程单词比较
+        """
         super().__init__()
         self.selectedDict = selectedDict
         self.selectedGroups = selectedGroups
+        self.snapshots = snapshots
+        self.localWords = list(localWords)
 
     def run(self):
         currentThread = QThread.currentThread()
+        batcher = SignalBatcher(self)
 
         def _pull(*args):
             if currentThread.isInterruptionRequested():
                 return
             wordPerPage = self.selectedDict.getWordsByPage(*args)
-            self.tick.emit()
+            batcher.count('tick')
             return wordPerPage
 
-        for groupName, groupId in self.selectedGroups:
-            totalPage = self.selectedDict.getTotalPage(groupName, groupId)
-            self.setProgress.emit(totalPage)
-            with ThreadPool(max_workers=3) as executor:
-                for i in range(totalPage):
-                    executor.submit(_pull, i, groupName, groupId)
-            remoteWordList = list(chain(*[ft for ft in executor.result]))
-            self.doneThisGroup.emit(remoteWordList)
+        def _skipPages(words, skippedPages):
+            batcher.count('tick', skippedPages)
+
+        remoteWords = []
+        # 获取出错时不提供新单词，也不删除任何本地单词
+        diff = [], [], list(self.localWords)
+        try:
+            with batcher:
+                groups = pullGroups(self.selectedDict, self.selectedGroups, _pull, self.setProgress.emit, snapshots=self.snapshots, onSnapshotWords=_skipPages)
+                for groupName, remoteWordList in groups:
+                    self.logger.info(f'分组{groupName}获取完毕，共{len(remoteWordList)}个单词')
+                    remoteWords.extend(remoteWordList)
+                    self.doneThisGroup.emit(remoteWordList)
+            diff = diffWords(self.localWords, remoteWords)
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            # 界面收到 diffDone 后才恢复可用，无论获取是否出错都要发送
+            self.diffDone.emit(*diff)
+            try:
+                getExecutor().logTimings()
+                evictHttpCache()
+            except Exception as e:
+                self.logger.exception(e)
+            finally:
+                self.done.emit()
+
 
-        self.done.emit()
+class QueryConfig(NamedTuple):
+    """一次查询共用的只读配置，所有单词共享同一个对象"""
+    api: type
+    fields: frozenset = None  # 需要的字段，只请求和解析这些字段，None 表示全部
+    cache: object = None  # 查询缓存
+    parserPool: object = None  # 解析进程池，None 时在查询线程中解析
 
 
 class QueryWorker(QObject):
     start = pyqtSignal()
-    tick = pyqtSignal()
-    thisRowDone = pyqtSignal(int, dict)
-    thisRowFailed = pyqtSignal(int)
+    tick = pyqtSignal(int)
+    rowsDone = pyqtSignal(list)  # [(行号, 查询结果)]
+    rowsFailed = pyqtSignal(list)  # [行号]
     allQueryDone = pyqtSignal()
     logger = logging.getLogger('dict2Anki.workers.QueryWorker')
 
-    def __init__(self, wordList: [dict], api):
+    def __init__(self, terms: [str], rows: [int], config: QueryConfig):
+        """
+        :param terms: 待查询单词
+        :param rows: 各单词在列表中的行号，与 terms 一一对应
+        :param config: 查询配置
+        """
         super().__init__()
-        self.wordList = wordList
-        self.api = api
+        self.terms = terms
+        self.rows = rows
+        self.config = config
+        self.api = config.api
+        self.cache = config.cache
+        self.fields = None if config.fields is None else frozenset(config.fields)
+        # 解析本身很轻的 API(如对冲查询)不值得传给子进程
+        self.parserPool = config.parserPool if getattr(config.api, 'parseInPool', True) else None
+        self.batcher = SignalBatcher(self)
+
+    def queryCached(self, word, row) -> bool:
+        """从缓存读取查询结果，命中时直接发送该行结果，已知查不到的单词直接发送失败"""
+        if not self.cache:
+            return False
+        try:
+            queryResult = self.cache.get(self.api, word, self.fields)
+            knownEmpty = not queryResult and self.cache.isKnownEmpty(self.api, word)
+        except sqlite3.Error as e:
+            # 缓存只是加速，读取失败时照常查询
+            self.logger.warning(f'读取查询缓存失败: {word} {e}')
+            return False
+        if queryResult:
+            self.logger.info(f'命中缓存: {word}')
+            self.batcher.append('rowsDone', (row, queryResult))
+        elif knownEmpty:
+            self.logger.info(f'近期查询无结果，跳过: {word}')
+            self.batcher.append('rowsFailed', row)
+        else:
+            return False
+        self.batcher.count('tick')
+        return True
+
+    def onQueried(self, word, row, queryResult, transient=False):
+        """
+        发送该行的查询结果，成功时写入缓存，查询无结果或解析失败时记入无结果缓存
+        :param transient: 网络错误等暂时性失败，不记入无结果缓存，下次仍会查询
+        """
+        queryResult = QueryResult.of(queryResult)
+        if queryResult and not isEmptyResult(queryResult, self.fields):
+            self.logger.info(f'查询成功: {word} -- {queryResult}')
+            self.batcher.append('rowsDone', (row, queryResult))
+            self.writeCache('put', word, queryResult, self.fields)
+        else:
+            reason = 'transient' if transient else ('empty' if queryResult else 'parse')
+            self.logger.warning(f'查询失败({reason}): {word}')
+            self.batcher.append('rowsFailed', row)
+            if not transient:
+                self.writeCache('putEmpty', word, reason)
+        self.batcher.count('tick')
+
+    def writeCache(self, method, word, *args):
+        """
+        写入查询缓存，失败时只记录日志
+        :param method: 缓存方法名，put 或 putEmpty
+        """
+        if not self.cache:
+            return
+        try:
+            getattr(self.cache, method)(self.api, word, *args)
+        except sqlite3.Error as e:
+            self.logger.warning(f'写入查询缓存失败: {word} {e}')
+
+    def queryStream(self, items):
+        """
+        查询 (单词, 行号) 序列，缓存未命中的单词交给 api.queryMany，按完成顺序发送各行结果
+        :param items: (单词, 行号) 迭代器，可以边产生边查询
+        """
+        currentThread = QThread.currentThread()
+        rows = defaultdict(deque)
+
+        def uncached():
+            for word, row in items:
+                if currentThread.isInterruptionRequested():
+                    return
+                if not self.queryCached(word, row):
+                    rows[word].append(row)
+                    yield word
+
+        parse = partial(self.parserPool.parse, self.api) if self.parserPool else None
+        for word, queryResult, error in self.api.queryMany(uncached(), self.fields, parse=parse):
+            if error is not None:
+                self.logger.error(f'查询出错: {word} {error!r}', exc_info=error)
+            if not rows.get(word):
+                self.logger.warning(f'{self.api.name} 返回了未请求的单词: {word}')
+                continue
+            row = rows[word].popleft()
+            transient = error is not None and not isinstance(error, ParseError)
+            try:
+                self.onQueried(word, row, queryResult, transient)
+            except Exception as e:
+                self.logger.exception(e)
+                self.batcher.append('rowsFailed', row)
+                self.batcher.count('tick')
+            if currentThread.isInterruptionRequested():
+                break
+
+    def finishQuery(self):
+        """查询结束后的清理，无论查询是否出错都发送 allQueryDone，界面据此恢复按钮"""
+        try:
+            getExecutor().logTimings()
+            evictHttpCache()
+            if self.cache:
+                self.cache.evict()
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            self.allQueryDone.emit()
+
+    def run(self):
+        try:
+            with self.batcher:
+                self.queryStream(zip(self.terms, self.rows))
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            self.finishQuery()
+
+
+class AsyncQueryWorker(QueryWorker):
+    """
+    asyncio 查询引擎，在工作线程中运行独立的事件循环
+    用 aiohttp 复用连接，同时保持数百个查询请求，信号与 QueryWorker 相同
+    """
+    isAvailable = aiohttp is not None
+    logger = logging.getLogger('dict2Anki.workers.AsyncQueryWorker')
+
+    def __init__(self, terms: [str], rows: [int], config: QueryConfig, concurrency=200):
+        super().__init__(terms, rows, config)
+        self.concurrency = concurrency
+
+    async def _query(self, session, semaphore, word, row):
+        async with semaphore:
+            if QThread.currentThread().isInterruptionRequested() or self.queryCached(word, row):
+                return
+
+            try:
+                url = self.api.requestUrl(word, self.fields)
+                wait = rateLimiter.reserve(urlparse(url).hostname)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                async with session.get(url) as rsp:
+                    rsp.raise_for_status()
+                    text = await rsp.text()
+                self.logger.debug(f'code:{rsp.status}- word:{word} text:{text[:100]}')
+            except Exception as e:
+                self.logger.exception(e)
+                self.onQueried(word, row, None, transient=True)
+                return
+
+            queryResult = None
+            transient = False
+            try:
+                if self.parserPool:
+                    queryResult = await asyncio.wrap_future(self.parserPool.submit(self.api, text, word, self.fields))
+                else:
+                    queryResult = self.api.parse(text, word, self.fields)
+            except BrokenProcessPool as e:
+                self.logger.exception(e)
+                transient = True
+            except Exception as e:
+                self.logger.exception(e)
+            self.onQueried(word, row, queryResult, transient)
+
+    async def _queryAll(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.api.timeout)
+        ) as session:
+            await asyncio.gather(*[self._query(session, semaphore, term, row) for term, row in zip(self.terms, self.rows)])
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            with self.batcher:
+                loop.run_until_complete(self._queryAll())
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            loop.close()
+            self.finishQuery()
+
+
+class PullAndQueryWorker(QueryWorker):
+    """边获取边查询：每获取到一页单词就与本地单词比对，新单词立即提交查询"""
+    setProgress = pyqtSignal(int)
+    newWords = pyqtSignal(list)
+    diffDone = pyqtSignal(list, list, list)  # 同 RemoteWordFetchingWorker，新单词已在获取过程中提交查询
+    logger = logging.getLogger('dict2Anki.workers.PullAndQueryWorker')
+
+    def __init__(self, selectedDict, selectedGroups: [tuple], localWords: set, config: QueryConfig, snapshots=None):
+        super().__init__([], [], config)
+        self.selectedDict = selectedDict
+        self.selectedGroups = selectedGroups
+        self.localWords = localWords
+        self.snapshots = snapshots
 
     def run(self):
         currentThread = QThread.currentThread()
+        lock = Lock()
+        remoteWords = []
+        seenWords = set()
+        rowCount = 0
+        progressMaximum = 0
 
-        def _query(word, row):
+        def _addWords(words, ticks=1):
+            nonlocal rowCount, progressMaximum
+            # 行号分配和 newWords 信号必须在同一把锁内，保证界面按行号顺序插入
+            with lock:
+                newWords = []
+                for word in words:
+                    if word in seenWords:
+                        continue
+                    seenWords.add(word)
+                    remoteWords.append(word)
+                    if word not in self.localWords:
+                        newWords.append(word)
+                firstRow = rowCount
+                rowCount += len(newWords)
+                if newWords:
+                    progressMaximum += len(newWords)
+                    self.setProgress.emit(progressMaximum)
+                    self.newWords.emit(newWords)
+            self.batcher.count('tick', ticks)
+
+            for row, word in enumerate(newWords, firstRow):
+                newWordQueue.put((word, row))
+
+        def _pull(*args):
             if currentThread.isInterruptionRequested():
                 return
-            queryResult = self.api.query(word)
-            if queryResult:
-                self.logger.info(f'查询成功: {word} -- {queryResult}')
-                self.thisRowDone.emit(row, queryResult)
-            else:
-                self.logger.warning(f'查询失败: {word}')
-                self.thisRowFailed.emit(row)
+            wordPerPage = self.selectedDict.getWordsByPage(*args)
+            _addWords(wordPerPage)
+            return wordPerPage
 
-            self.tick.emit()
-            return queryResult
+        def _addProgress(totalPage):
+            nonlocal progressMaximum
+            with lock:
+                progressMaximum += totalPage
+                self.setProgress.emit(progressMaximum)
 
-        with ThreadPool(max_workers=3) as executor:
-            for word in self.wordList:
-                executor.submit(_query, word['term'], word['row'])
+        def _pullAll():
+            # 获取出错时已提交的新单词照常查询，但不删除任何本地单词
+            diff = [], [], list(self.localWords)
+            try:
+                for _ in pullGroups(self.selectedDict, self.selectedGroups, _pull, _addProgress, snapshots=self.snapshots, onSnapshotWords=_addWords):
+                    pass
+                diff = diffWords(self.localWords, remoteWords)
+            except Exception as e:
+                self.logger.exception(e)
+            finally:
+                self.diffDone.emit(*diff)
 
-        self.allQueryDone.emit()
+        newWordQueue = Queue()
+        try:
+            # 获取线程发现的新单词依次进入查询，获取任务结束后队列以 None 结束
+            # None 在任务的完成回调中放入，任务在开始前被 shutdownExecutor 取消时查询也能结束
+            getExecutor().submit(_pullAll).add_done_callback(lambda future: newWordQueue.put(None))
+            with self.batcher:
+                self.queryStream(iter(newWordQueue.get, None))
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            self.finishQuery()
 
 
 class AudioDownloadWorker(QObject):
     start = pyqtSignal()
-    tick = pyqtSignal()
+    tick = pyqtSignal(int)
     done = pyqtSignal()
     logger = logging.getLogger('dict2Anki.workers.AudioDownloadWorker')
-    retries = Retry(total=5, backoff_factor=3, status_forcelist=[500, 502, 503, 504])
+    retries = defaultRetries
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    session.mount('http://', RateLimitedAdapter(max_retries=retries))
+    session.mount('https://', RateLimitedAdapter(max_retries=retries))
 
     def __init__(self, audios: [tuple]):
         super().__init__()
@@ -153,9 +622,17 @@ class AudioDownloadWorker(QObject):
             except Exception as e:
                 self.logger.warning(f'下载{fileName}:{url}异常: {e}')
             finally:
-                self.tick.emit()
+                batcher.count('tick')
 
-        with ThreadPool(max_workers=3) as executor:
-            for fileName, url in self.audios:
-                executor.submit(__download, fileName, url)
-        self.done.emit()
+        batcher = SignalBatcher(self)
+        try:
+            executor = getExecutor()
+            with batcher:
+                for _ in executor.map(__download, *zip(*self.audios), maxInFlight=3):
+                    pass
+            executor.logTimings()
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            # 界面收到 done 后才结束下载线程，无论下载是否出错都要发送
+            self.done.emit()
@@ -0,0 +1,38 @@
+"""
+欧陆词典页面解析性能：html.parser 解析整个页面 vs 只解析需要的区域(html.parser / lxml)
+使用 test/fixtures 下的响应样本
+
+运行: PYTHONPATH=. python benchmark/bench_eudictParser.py [重复次数]
+"""
+import os
+import sys
+import time
+from addon.queryApi import eudict
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'fixtures')
+
+
+def bench(samples, repeat, **kwargs):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for term, html in samples:
+            eudict.Parser(html, term, **kwargs).result
+    return (time.perf_counter() - start) / (repeat * len(samples))
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    samples = []
+    for fileName in sorted(os.listdir(FIXTURES)):
+        if fileName.startswith('eudict_'):
+            with open(os.path.join(FIXTURES, fileName), encoding='utf-8') as f:
+                samples.append((fileName[7:-5], f.read()))
+
+    baseline = bench(samples, repeat, backend='html.parser', fullPage=True)
+    print(f'html.parser full page : {baseline * 1000:7.3f} ms/page')
+    for backend in ['html.parser', 'lxml']:
+        if backend == 'lxml' and eudict.PARSER_BACKEND != 'lxml':
+            print('lxml regions         : lxml not installed')
+            continue
+        elapsed = bench(samples, repeat, backend=backend)
+        print(f'{backend:<11} regions   : {elapsed * 1000:7.3f} ms/page ({baseline / elapsed:.2f}x)')
@@ -0,0 +1,57 @@
+"""
+getWordsByDeck 性能对比：逐条 getNote(N+1) vs 单次 SQL 查询
+用 test/dummy_anki 中的内存 notes/cards 表构造一个包含 10 万条笔记的 Anki collection
+
+运行: PYTHONPATH=. python benchmark/bench_getWordsByDeck.py [笔记数]
+"""
+import sys
+import time
+from addon import noteManager
+from test.dummy_anki.dummy_sqlite_collection import Collection, model
+
+MODEL_ID = 1
+DECK = {'id': 100, 'name': 'Dict2Anki'}
+
+
+def createCollection(noteCount) -> Collection:
+    col = Collection([model(MODEL_ID, 'Dict2Anki-v6.1.5', ['term', 'definition', 'sentenceFront'])], [DECK])
+    col.addNotes((nid, MODEL_ID, [f'word{nid}', f'definition of word{nid}', ''], DECK['id'], 0) for nid in range(noteCount))
+    return col
+
+
+class mw:
+    col = None
+
+
+def legacyGetWordsByDeck(deckName):
+    notes = mw.col.findNotes(f'deck:"{deckName}"')
+    words = []
+    for nid in notes:
+        note = mw.col.getNote(nid)
+        if note.model().get('name', '').lower().startswith('dict2anki') and note['term']:
+            words.append(note['term'])
+    return words
+
+
+def bench(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(DECK['name'])
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    noteCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    mw.col = createCollection(noteCount)
+    noteManager.mw = mw
+
+    legacyTime, legacyWords = bench(legacyGetWordsByDeck)
+    bulkTime, bulkWords = bench(noteManager.getWordsByDeck)
+    assert set(legacyWords) == bulkWords
+
+    print(f'{noteCount} notes')
+    print(f'N+1 getNote : {legacyTime * 1000:8.1f} ms')
+    print(f'single SQL  : {bulkTime * 1000:8.1f} ms ({legacyTime / bulkTime:.1f}x)')
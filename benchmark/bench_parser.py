@@ -0,0 +1,80 @@
+"""
+查询结果解析性能：每个字段重复计算(旧) vs 每个字段只计算一次
+默认使用 test/fixtures 下手工构造的响应样本，结构与真实页面一致但内容较少，只能说明相对差异
+评估真实收益时，把录制的响应按 eudict_<单词>.html / youdao_<单词>.json 命名放入一个目录并作为第二个参数传入
+
+两种实现交替运行多轮，报告每页耗时的中位数和最小/最大值；两者的范围重叠时差异在噪声之内，不报告倍数
+
+运行: PYTHONPATH=. python benchmark/bench_parser.py [轮数] [样本目录]
+"""
+import os
+import gc
+import sys
+import json
+import time
+import statistics
+from addon.queryApi import eudict, youdao
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'fixtures')
+
+
+def legacy(parserClass):
+    """把只计算一次的字段还原成每次访问都重新计算的 property"""
+    attrs = {
+        name: property(value.fn)
+        for klass in reversed(parserClass.__mro__)
+        for name, value in vars(klass).items()
+        if hasattr(value, 'fn')
+    }
+    return type(f'Legacy{parserClass.__name__}', (parserClass,), attrs)
+
+
+def load(directory, fileName, parse):
+    with open(os.path.join(directory, fileName), encoding='utf-8') as f:
+        return parse(f.read())
+
+
+def bench(parserClass, samples) -> float:
+    """解析一遍全部样本，返回每页耗时(秒)"""
+    start = time.perf_counter()
+    for term, response in samples:
+        parserClass(response, term).result
+    return (time.perf_counter() - start) / len(samples)
+
+
+def compare(parserClasses, samples, rounds) -> list:
+    """交替运行各实现，抵消运行过程中机器负载的变化，返回每个实现各轮的耗时"""
+    timings = [[] for _ in parserClasses]
+    for parserClass in parserClasses:  # 预热
+        bench(parserClass, samples)
+    gc.disable()
+    try:
+        for i in range(rounds):
+            order = list(enumerate(parserClasses))
+            for index, parserClass in (order if i % 2 == 0 else reversed(order)):
+                timings[index].append(bench(parserClass, samples))
+            gc.collect()
+    finally:
+        gc.enable()
+    return timings
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 31
+    directory = sys.argv[2] if len(sys.argv) > 2 else FIXTURES
+    files = sorted(os.listdir(directory))
+    eudictSamples = [(f[7:-5], load(directory, f, str)) for f in files if f.startswith('eudict_') and f.endswith('.html')]
+    youdaoSamples = [(f[7:-5], load(directory, f, json.loads)) for f in files if f.startswith('youdao_') and f.endswith('.json')]
+    print(f'样本目录 {directory}，{rounds} 轮')
+
+    for name, parserClass, samples in [('eudict', eudict.Parser, eudictSamples), ('youdao', youdao.Parser, youdaoSamples)]:
+        if not samples:
+            continue
+        legacyTimes, parseOnceTimes = compare([legacy(parserClass), parserClass], samples, rounds)
+        for label, times in [('legacy', legacyTimes), ('parse once', parseOnceTimes)]:
+            print(f'{name} {label:10}: median {statistics.median(times) * 1000:7.3f} ms/page '
+                  f'(min {min(times) * 1000:7.3f}, max {max(times) * 1000:7.3f}, {len(samples)} pages)')
+        if max(parseOnceTimes) < min(legacyTimes) or max(legacyTimes) < min(parseOnceTimes):
+            print(f'{name} median ratio: {statistics.median(legacyTimes) / statistics.median(parseOnceTimes):.2f}x')
+        else:
+            print(f'{name}: 两者耗时范围重叠，差异在噪声之内')
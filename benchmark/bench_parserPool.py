@@ -0,0 +1,45 @@
+"""
+解析进程池性能：3 个查询线程各自解析 vs 查询线程把解析交给进程池
+模拟一次查询大量欧陆词典单词时的解析部分，响应使用 test/fixtures 下的样本
+
+运行: PYTHONPATH=. python benchmark/bench_parserPool.py [页面数] [进程数...]
+"""
+import os
+import sys
+import time
+from itertools import cycle, islice
+from addon.misc import ExecutorService, ParserPool
+from addon.queryApi import eudict
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'fixtures')
+
+
+def bench(pages, parse):
+    executor = ExecutorService(maxWorkers=3)
+    start = time.perf_counter()
+    for _ in executor.map(parse, *zip(*pages), maxInFlight=3):
+        pass
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return elapsed
+
+
+if __name__ == '__main__':
+    pageCount = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    processCounts = [int(n) for n in sys.argv[2:]] or [1, 2, 4, 8]
+    samples = []
+    for fileName in sorted(os.listdir(FIXTURES)):
+        if fileName.startswith('eudict_'):
+            with open(os.path.join(FIXTURES, fileName), encoding='utf-8') as f:
+                samples.append((f.read(), fileName[7:-5]))
+    pages = list(islice(cycle(samples), pageCount))
+
+    print(f'{pageCount} pages, {os.cpu_count()} cores')
+    baseline = bench(pages, lambda text, word: eudict.API.parse(text, word))
+    print(f'in-thread   : {baseline:6.2f} s ({pageCount / baseline:7.1f} pages/s)')
+    for processes in processCounts:
+        pool = ParserPool(processes)
+        pool.parse(eudict.API, *samples[0])  # 启动子进程
+        elapsed = bench(pages, lambda text, word: pool.parse(eudict.API, text, word))
+        pool.shutdown()
+        print(f'{processes} processes : {elapsed:6.2f} s ({pageCount / elapsed:7.1f} pages/s, {baseline / elapsed:.2f}x)')
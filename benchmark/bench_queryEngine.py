@@ -0,0 +1,72 @@
+"""
+查询引擎性能对比：线程池(QueryWorker) vs asyncio(AsyncQueryWorker)
+启动一个本地 HTTP 服务模拟有道 jsonapi，每个请求固定延迟后返回同一份结果
+
+运行: PYTHONPATH=. python benchmark/bench_queryEngine.py [单词数] [服务端延迟毫秒]
+"""
+import sys
+import json
+import time
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from addon.queryApi import youdao
+from addon.throttle import rateLimiter
+from addon.workers import QueryWorker, AsyncQueryWorker, QueryConfig
+from addon.misc import shutdownExecutor
+
+BODY = json.dumps({
+    'simple': {'word': [{'usphone': 'ˈflaʊər', 'ukphone': 'ˈflaʊə(r)', 'usspeech': 'flower&type=2', 'ukspeech': 'flower&type=1'}]},
+    'ec': {'word': [{'trs': [{'tr': [{'l': {'i': ['n. 花；精华']}}]}]}]},
+}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench(workerClass, api, words):
+    worker = workerClass(words, range(len(words)), QueryConfig(api))
+    done = []
+    worker.rowsDone.connect(done.extend)
+    start = time.perf_counter()
+    worker.run()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    wordCount = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    Handler.latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    class LocalAPI(youdao.API):
+        name = '本地测试 API'
+        url = f'http://127.0.0.1:{server.server_port}/jsonapi'
+
+    rateLimiter.configure({'rate': 1e9, 'burst': 1e9})
+    words = [f'word{i}' for i in range(wordCount)]
+
+    print(f'{wordCount} words, server latency {Handler.latency * 1000:.0f} ms')
+    threadTime = bench(QueryWorker, LocalAPI, words)
+    print(f'thread pool : {threadTime:6.2f} s ({wordCount / threadTime:7.1f} words/s)')
+    if AsyncQueryWorker.isAvailable:
+        asyncTime = bench(AsyncQueryWorker, LocalAPI, words)
+        print(f'asyncio     : {asyncTime:6.2f} s ({wordCount / asyncTime:7.1f} words/s, {threadTime / asyncTime:.1f}x)')
+    else:
+        print('asyncio     : aiohttp not installed')
+
+    shutdownExecutor()
+    server.shutdown()
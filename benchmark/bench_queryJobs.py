@@ -0,0 +1,50 @@
+"""
+查询任务内存占用：每个单词一个复制了全部配置的 dict(旧) vs 单词/行号列表 + 共用的 QueryConfig
+用 tracemalloc 统计构造查询任务时的内存峰值
+
+运行: PYTHONPATH=. python benchmark/bench_queryJobs.py [单词数]
+"""
+import sys
+import tracemalloc
+from addon.constants import BASIC_OPTION, EXTRA_OPTION
+from addon.queryApi import youdao
+from addon.workers import QueryConfig
+
+CONFIG = {name: True for name in BASIC_OPTION + EXTRA_OPTION}
+
+
+def legacy(words):
+    """原 on_queryBtn_clicked 中的构造方式"""
+    wordList = []
+    for row, word in enumerate(words):
+        wordBundle = dict()
+        wordBundle['term'] = word
+        for configName in BASIC_OPTION + EXTRA_OPTION:
+            wordBundle[configName] = CONFIG[configName]
+            wordBundle['row'] = row
+        wordList.append(wordBundle)
+    return wordList
+
+
+def compact(words):
+    fields = frozenset(name for name in BASIC_OPTION if CONFIG[name])
+    return list(words), range(len(words)), QueryConfig(youdao.API, fields=fields)
+
+
+def peak(build, words):
+    tracemalloc.start()
+    jobs = build(words)
+    _, peakSize = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del jobs
+    return peakSize
+
+
+if __name__ == '__main__':
+    wordCount = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    words = [f'word{i}' for i in range(wordCount)]
+    legacyPeak = peak(legacy, words)
+    compactPeak = peak(compact, words)
+    print(f'{wordCount} words')
+    print(f'per-word dict : {legacyPeak / 1024 / 1024:7.2f} MiB')
+    print(f'shared config : {compactPeak / 1024 / 1024:7.2f} MiB ({legacyPeak / compactPeak:.0f}x less)')
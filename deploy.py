@@ -17,7 +17,7 @@ print(addon_id)
 
 def create_zip():
     file_paths = []
-    exclude_dirs = ['test', '__pycache__', '.git', '.idea', '.pytest_cache', 'screenshots', 'venv']
+    exclude_dirs = ['test', '__pycache__', '.git', '.idea', '.pytest_cache', 'screenshots', 'venv', 'user_files', 'benchmark']
     exclude_files = ['README.md', '.gitignore', '.travis.yml', 'deploy.py', 'requirements.txt', '.DS_Store',
                      'meta.json']
     exclude_ext = ['.png', '.ui', '.qrc', '.log', '.zip', '.tpl']
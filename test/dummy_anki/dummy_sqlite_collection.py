@@ -0,0 +1,87 @@
+import sqlite3
+
+
+class DB:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def all(self, sql, *args):
+        return self.conn.execute(sql, args).fetchall()
+
+
+class Note:
+    def __init__(self, col, nid):
+        mid, flds = col.db.conn.execute('SELECT mid, flds FROM notes WHERE id=?', (nid,)).fetchone()
+        self._model = col.models.get(mid)
+        self._fields = dict(zip([f['name'] for f in self._model['flds']], flds.split('\x1f')))
+
+    def model(self):
+        return self._model
+
+    def __getitem__(self, item):
+        return self._fields[item]
+
+
+class Models:
+    def __init__(self, models):
+        self._models = {model['id']: model for model in models}
+
+    def all(self):
+        return list(self._models.values())
+
+    def get(self, mid):
+        return self._models.get(mid)
+
+
+class Decks:
+    def __init__(self, decks):
+        self._decks = decks
+
+    def byName(self, name):
+        return next((deck for deck in self._decks if deck['name'] == name), None)
+
+    def children(self, did):
+        parent = next(deck for deck in self._decks if deck['id'] == did)
+        return [(deck['name'], deck['id']) for deck in self._decks if deck['name'].startswith(parent['name'] + '::')]
+
+
+def model(mid, name, fieldNames) -> dict:
+    return {'id': mid, 'name': name, 'flds': [{'name': fieldName, 'ord': i} for i, fieldName in enumerate(fieldNames)]}
+
+
+class Collection:
+    """
+    用内存中的 notes/cards 表模拟 Anki collection，供 noteManager 的 SQL 查询使用
+    :param models: 模版列表，见 model()
+    :param decks: [{'id': 牌组id, 'name': 牌组名称}]，子牌组名称以 父牌组:: 开头
+    """
+
+    def __init__(self, models, decks):
+        self.models = Models(models)
+        self.decks = Decks(decks)
+        conn = sqlite3.connect(':memory:')
+        conn.executescript('''
+            CREATE TABLE notes (id INTEGER PRIMARY KEY, mid INTEGER, flds TEXT);
+            CREATE TABLE cards (id INTEGER PRIMARY KEY, nid INTEGER, did INTEGER, odid INTEGER);
+            CREATE INDEX ix_cards_nid ON cards (nid);
+        ''')
+        self.db = DB(conn)
+
+    def addNotes(self, notes):
+        """
+        :param notes: [(note id, 模版id, 字段列表, 牌组id, 原牌组id)]，卡片在筛选牌组中时原牌组id不为 0
+        """
+        notes = list(notes)
+        self.db.conn.executemany('INSERT INTO notes VALUES (?, ?, ?)', ((nid, mid, '\x1f'.join(fields)) for nid, mid, fields, _, _ in notes))
+        self.db.conn.executemany('INSERT INTO cards (nid, did, odid) VALUES (?, ?, ?)', ((nid, did, odid) for nid, _, _, did, odid in notes))
+
+    def addCard(self, nid, did, odid=0):
+        self.db.conn.execute('INSERT INTO cards (nid, did, odid) VALUES (?, ?, ?)', (nid, did, odid))
+
+    def findNotes(self, query):
+        """只支持 deck:"牌组名称"，不含子牌组和筛选牌组"""
+        deck = self.decks.byName(query[len('deck:"'):-1])
+        return [row[0] for row in self.db.all('SELECT DISTINCT nid FROM cards WHERE did=?', deck['id'])]
+
+    def getNote(self, nid):
+        return Note(self, nid)
@@ -10,6 +10,10 @@ class mw:
     def reset():
         pass
 
+    @staticmethod
+    def checkpoint(*args, **kwargs):
+        pass
+
 
 def askUser(*args, **kwargs):
     return True
@@ -18,8 +18,12 @@ def addNoteToDeck(deckObject, modelObject, currentConfig: dict, oneQueryResult:
     pass
 
 
+def addNotesToDeck(deckObject, modelObject, currentConfig: dict, queryResults: [dict]):
+    return len(queryResults)
+
+
 def getWordsByDeck(*args, **kwargs):
-    return []
+    return set()
 
 
 def getNotes(*args, **kwargs):
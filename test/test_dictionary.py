@@ -0,0 +1,69 @@
+import pytest
+from addon.dictionary.youdao import Youdao
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {'code': 0, 'data': self.data}
+
+
+class FakeWordbookSession:
+    """模拟有道单词本 webapi，每页最多返回 serverLimit 个单词"""
+
+    def __init__(self, books, serverLimit):
+        self.books = books
+        self.serverLimit = serverLimit
+        self.requests = 0
+
+    def get(self, url, timeout=None, params=None):
+        self.requests += 1
+        words = self.books[params['bookId']]
+        limit = min(params['limit'], self.serverLimit)
+        items = words[params['offset']:params['offset'] + limit]
+        return FakeResponse({'total': len(words), 'itemList': [{'word': w} for w in items]})
+
+
+@pytest.fixture
+def youdao(monkeypatch):
+    monkeypatch.setattr(Youdao, 'pageSize', None)
+    return Youdao()
+
+
+def pullAll(dictionary, groupId):
+    totalPage = dictionary.getTotalPage('group', groupId)
+    return [w for pageNo in range(totalPage) for w in dictionary.getWordsByPage(pageNo, 'group', groupId)]
+
+
+@pytest.mark.parametrize('serverLimit', [15, 100, 5000])
+def test_youdao_page_size_probing(youdao, serverLimit):
+    books = {1: [f'a{i}' for i in range(40)], 2: [f'b{i}' for i in range(6000)]}
+    youdao.session = FakeWordbookSession(books, serverLimit)
+
+    assert pullAll(youdao, 1) == books[1]
+    assert pullAll(youdao, 2) == books[2]
+    expectedPageSize = min(serverLimit, Youdao.maxPageSize)
+    assert Youdao.pageSize == expectedPageSize
+    assert youdao.session.requests <= 2 + 1 + 2 + 6000 // expectedPageSize + 1
+
+
+def test_youdao_small_group_skips_probing(youdao):
+    youdao.session = FakeWordbookSession({1: ['a', 'b']}, 100)
+    assert pullAll(youdao, 1) == ['a', 'b']
+    assert Youdao.pageSize is None
+
+
+def test_youdao_probe_is_reused_as_first_page(youdao):
+    books = {1: [f'a{i}' for i in range(250)]}
+    youdao.session = FakeWordbookSession(books, 100)
+    assert pullAll(youdao, 1) == books[1]
+    # 单词总数、探测(即第一页)、第二页、第三页
+    assert youdao.session.requests == 4
+
+    # 再次获取时重新请求单词总数，已知每页数量不再探测
+    books[1] = ['new'] + books[1]
+    youdao.session.requests = 0
+    assert pullAll(youdao, 1) == books[1]
+    assert youdao.session.requests == 1 + 3
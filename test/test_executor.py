@@ -0,0 +1,110 @@
+import os
+import time
+import pytest
+from threading import Lock
+from concurrent.futures.process import BrokenProcessPool
+from addon.misc import ExecutorService, ParserPool
+from addon.throttle import AIMDController
+
+
+def test_map_keeps_order_and_falsy_results():
+    executor = ExecutorService(maxWorkers=4)
+
+    def task(i):
+        time.sleep(0.01 * (5 - i))
+        return i % 2
+
+    assert list(executor.map(task, range(5))) == [0, 1, 0, 1, 0]
+    executor.shutdown()
+
+
+def test_map_unordered_yields_in_completion_order():
+    executor = ExecutorService(maxWorkers=4)
+
+    def task(i):
+        time.sleep(0.05 * (3 - i))
+        return i
+
+    assert list(executor.mapUnordered(task, range(4), maxInFlight=4)) == [3, 2, 1, 0]
+    executor.shutdown()
+
+
+def test_map_max_in_flight():
+    executor = ExecutorService(maxWorkers=8)
+    lock = Lock()
+    running = 0
+    peak = 0
+
+    def task(i):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return i
+
+    assert list(executor.map(task, range(20), maxInFlight=3)) == list(range(20))
+    assert peak <= 3
+    executor.shutdown()
+
+
+def test_shutdown_cancels_pending():
+    executor = ExecutorService(maxWorkers=1)
+    futures = [executor.submit(time.sleep, 0.05) for _ in range(5)]
+    executor.shutdown()
+    assert futures[0].done() and not futures[0].cancelled()
+    assert all(f.cancelled() for f in futures[1:])
+
+
+def test_parser_pool_matches_in_thread_parse():
+    from addon.queryApi import eudict
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'eudict_flower.html')
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+
+    pool = ParserPool(2)
+    try:
+        assert pool.parse(eudict.API, html, 'flower', frozenset({'definition'})) == eudict.API.parse(html, 'flower', {'definition'})
+    finally:
+        pool.shutdown()
+
+
+class CrashingAPI:
+    """解析时结束所在进程，模拟解析进程被系统杀死"""
+
+    @classmethod
+    def parse(cls, text, word, fields=None):
+        if text == 'crash':
+            os._exit(1)
+        return word
+
+
+def test_parser_pool_recovers_from_killed_worker():
+    pool = ParserPool(1)
+    try:
+        assert pool.parse(CrashingAPI, 'ok', 'a') == 'a'
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(CrashingAPI, 'crash', 'b').result()
+        # 进程池重建后后续解析照常进行
+        assert pool.parse(CrashingAPI, 'ok', 'c') == 'c'
+        assert pool.submit(CrashingAPI, 'ok', 'd').result() == 'd'
+    finally:
+        pool.shutdown()
+
+
+def test_map_releases_gate_after_shutdown():
+    executor = ExecutorService(maxWorkers=2)
+    executor.shutdown()
+    controller = AIMDController(initial=1)
+    assert list(executor.map(lambda i: i, range(3), gate=controller)) == []
+    assert controller._inFlight == 0
+
+
+def test_map_unordered_releases_gate_after_shutdown():
+    executor = ExecutorService(maxWorkers=2)
+    executor.shutdown()
+    controller = AIMDController(initial=1)
+    assert list(executor.mapUnordered(lambda i: i, range(3), gate=controller)) == []
+    assert controller._inFlight == 0
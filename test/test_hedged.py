@@ -0,0 +1,77 @@
+import time
+import pytest
+from addon.misc import getExecutor, shutdownExecutor
+from addon.queryApi.hedged import HedgedAPI
+
+
+class Parser:
+    version = 1
+
+
+def dummyAPI(name, delay=0.0, text=None, error=None):
+    def fetch(cls, word, fields=None):
+        time.sleep(delay)
+        if error:
+            raise error
+        return text or name
+
+    def parse(cls, text, word, fields=None):
+        if text == 'broken':
+            raise ValueError(text)
+        return {'term': word, 'definition': [] if text == 'empty' else [text]}
+
+    return type(name, (), {'name': name, 'timeout': 1, 'parser': Parser, 'fetch': classmethod(fetch), 'parse': classmethod(parse)})
+
+
+def query(primary, secondary, word='flower'):
+    api = HedgedAPI.of(primary, secondary)
+    api.defaultHedgeDelay = 0.1
+    api.minHedgeDelay = 0.05
+    return api.parse(api.fetch(word), word)
+
+
+def test_hedged_query_takes_first_complete_result():
+    assert query(dummyAPI('fast'), dummyAPI('backup'))['definition'] == ('fast',)
+
+    start = time.perf_counter()
+    assert query(dummyAPI('slow', delay=0.5), dummyAPI('backup'))['definition'] == ('backup',)
+    assert time.perf_counter() - start < 0.4
+
+    # 备用 API 更慢时仍使用先返回的主 API
+    assert query(dummyAPI('slow', delay=0.2), dummyAPI('slower', delay=0.6))['definition'] == ('slow',)
+
+
+def test_hedged_query_falls_back():
+    assert query(dummyAPI('broken', text='broken'), dummyAPI('backup'))['definition'] == ('backup',)
+    assert query(dummyAPI('down', error=ConnectionError()), dummyAPI('backup'))['definition'] == ('backup',)
+    assert query(dummyAPI('empty', text='empty'), dummyAPI('backup'))['definition'] == ('backup',)
+
+    assert query(dummyAPI('empty', text='empty'), dummyAPI('broken', text='broken'))['definition'] == ()
+    assert query(dummyAPI('broken', text='broken'), dummyAPI('broken', text='broken')) is None
+    with pytest.raises(ConnectionError):
+        query(dummyAPI('down', error=ConnectionError()), dummyAPI('down', error=TimeoutError()))
+
+    # 有 API 请求失败时，另一个 API 没有结果或解析失败都不是确定的结果，抛出网络异常按暂时性失败处理
+    with pytest.raises(ConnectionError):
+        query(dummyAPI('down', error=ConnectionError()), dummyAPI('broken', text='broken'))
+    with pytest.raises(ConnectionError):
+        query(dummyAPI('down', error=ConnectionError()), dummyAPI('empty', text='empty'))
+    with pytest.raises(ConnectionError):
+        query(dummyAPI('broken', text='broken'), dummyAPI('down', error=ConnectionError()))
+
+
+def test_hedged_executor_shuts_down_with_shared_executors():
+    api = HedgedAPI.of(dummyAPI('fast'), dummyAPI('backup'))
+    api.parse(api.fetch('flower'), 'flower')
+    executor = getExecutor('hedge')
+    shutdownExecutor()
+    assert executor.isShutdown
+    # 关闭后再次查询会重新创建线程池
+    assert api.parse(api.fetch('flower'), 'flower')['definition'] == ('fast',)
+    assert getExecutor('hedge') is not executor
+
+
+def test_hedged_request_url_is_primary_url():
+    from addon.queryApi import youdao, eudict
+    api = HedgedAPI.of(youdao.API, eudict.API)
+    assert api.requestUrl('flower', {'definition'}) == youdao.API.requestUrl('flower', {'definition'})
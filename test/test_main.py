@@ -1,5 +1,4 @@
 import pytest
-from PyQt5.QtCore import Qt
 
 from addon.addonWindow import Windows
 from addon.constants import VERSION
@@ -117,10 +116,9 @@ def test_get_deck_list(qtbot, fresh_config, mocker):
     []
 ])
 def test_newWordWidget(window, words):
-    window.insertWordToListWidget(words)
-    assert [window.newWordListWidget.item(row).text() for row in range(window.newWordListWidget.count())] == words
-    assert all(
-        window.newWordListWidget.item(row).data(Qt.UserRole) is None for row in range(window.newWordListWidget.count()))
+    window.appendNewWords(words)
+    assert window.newWordModel.words == words
+    assert all(result is None for result in window.newWordModel.results)
 
 
 @pytest.mark.skip
@@ -143,27 +141,24 @@ def test_fetch_word_and_compare(monkeypatch, mocker, window, qtbot, local_words,
     qtbot.waitUntil(window.workerThread.isRunning, timeout=5000)
     window.getRemoteWordList(['group_1'])
     qtbot.wait(1000)
-    item_in_list_widget = [window.newWordListWidget.item(row) for row in range(window.newWordListWidget.count())]
-    item_in_del_widget = [window.needDeleteWordListWidget.item(row) for row in
-                          range(window.needDeleteWordListWidget.count())]
-    words_in_list_widget = [i.text() for i in item_in_list_widget]
-    words_in_del_widget = [i.text() for i in item_in_del_widget]
+    words_in_list_widget = window.newWordModel.words
+    words_in_del_widget = window.needDeleteWordModel.words
 
-    assert all([item.data(Qt.UserRole) is None for item in item_in_list_widget])
+    assert all(result is None for result in window.newWordModel.results)
     if test_index == 0:
-        assert item_in_list_widget == []
-        assert item_in_del_widget == []
+        assert words_in_list_widget == []
+        assert words_in_del_widget == []
         assert mocked_tooltip.called_with('无需同步')
     elif test_index == 1:
         assert sorted(words_in_list_widget) == sorted(remote_words)
-        assert item_in_del_widget == []
+        assert words_in_del_widget == []
     elif test_index == 2:
-        assert item_in_list_widget == []
-        assert item_in_del_widget == []
+        assert words_in_list_widget == []
+        assert words_in_del_widget == []
         assert mocked_tooltip.called_with('无需同步')
     elif test_index == 3:
         assert words_in_list_widget == ['b']
-        assert item_in_del_widget == []
+        assert words_in_del_widget == []
     elif test_index == 4:
         assert sorted(words_in_list_widget) == sorted(remote_words)
         assert sorted(words_in_del_widget) == sorted(local_words)
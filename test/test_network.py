@@ -0,0 +1,130 @@
+import sqlite3
+import pytest
+import requests
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from addon.cache import HttpCache
+from addon import network
+from addon.network import CachingAdapter, RateLimitedAdapter, RateLimitedRetry, setHttpCache
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    body = 'flower 花'.encode('utf-8')
+    etag = '"v1"'
+    served = []
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            self.served.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.served.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    ETagHandler.served = []
+    httpd = HTTPServer(('127.0.0.1', 0), ETagHandler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = HttpCache(str(tmp_path / 'cache.db'))
+    setHttpCache(c)
+    yield c
+    setHttpCache(None)
+    c.close()
+
+
+def test_conditional_get(server, cache):
+    session = requests.Session()
+    session.mount('http://', CachingAdapter())
+
+    first = session.get(f'{server}/words')
+    second = session.get(f'{server}/words')
+    assert ETagHandler.served == [200, 304]
+    assert second.status_code == 200
+    assert second.text == first.text == 'flower 花'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 不同 Cookie 的响应分开缓存
+    session.get(f'{server}/words', cookies={'DICT_SESS': 'other'})
+    assert ETagHandler.served == [200, 304, 200]
+
+
+def test_http_cache_evicts_by_size(server, cache):
+    session = requests.Session()
+    session.mount('http://', CachingAdapter())
+    for page in range(3):
+        session.get(f'{server}/words?page={page}')
+    cache.maxSize = len(ETagHandler.body) * 2
+    cache.evict()
+    assert len(cache._execute('SELECT key FROM http_cache')) == 2
+
+
+class LockedHttpCache(HttpCache):
+    """另一个连接正在写入 cache.db 时的缓存"""
+
+    def _execute(self, sql, params=(), commit=False):
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_http_cache_errors_fall_through(server, tmp_path):
+    cache = LockedHttpCache(str(tmp_path / 'cache.db'))
+    setHttpCache(cache)
+    try:
+        session = requests.Session()
+        session.mount('http://', CachingAdapter())
+        assert session.get(f'{server}/words').text == 'flower 花'
+        assert ETagHandler.served == [200]
+        assert cache.misses == 1
+    finally:
+        setHttpCache(None)
+        cache.close()
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    failures = 2
+
+    def do_GET(self):
+        if FlakyHandler.failures:
+            FlakyHandler.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_retries_take_rate_limiter_tokens(monkeypatch):
+    acquired = []
+    monkeypatch.setattr(network.rateLimiter, 'acquire', acquired.append)
+    httpd = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        session = requests.Session()
+        session.mount('http://', RateLimitedAdapter(max_retries=RateLimitedRetry(total=3, backoff_factor=0, status_forcelist=[503])))
+        assert session.get(f'http://127.0.0.1:{httpd.server_port}/').text == 'ok'
+    finally:
+        httpd.shutdown()
+    # 第一次请求和两次重试各领取一个令牌
+    assert acquired == ['127.0.0.1'] * 3
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from addon import noteManager
+from addon.misc import QueryResult
+from addon.constants import BASIC_OPTION, EXTRA_OPTION
+from test.dummy_anki.dummy_sqlite_collection import Collection, model
+
+
+class FakeNote(dict):
+    def __init__(self, col, model):
+        super().__init__()
+        self.model = model
+
+
+class FakeCollection:
+    def __init__(self, failingTerms=()):
+        self.failingTerms = set(failingTerms)
+        self.notes = []
+        self.resets = 0
+
+    def addNote(self, note):
+        if note['term'] in self.failingTerms:
+            raise ValueError(note['term'])
+        self.notes.append(note)
+
+    def reset(self):
+        self.resets += 1
+
+
+class FakeMainWindow:
+    def __init__(self, col):
+        self.col = col
+        self.checkpoints = []
+
+    def checkpoint(self, name):
+        self.checkpoints.append(name)
+
+
+def useCollection(monkeypatch, col) -> FakeMainWindow:
+    mw = FakeMainWindow(col)
+    monkeypatch.setattr(noteManager, 'mw', mw)
+    monkeypatch.setattr(noteManager, 'anki', SimpleNamespace(notes=SimpleNamespace(Note=FakeNote)))
+    return mw
+
+
+def test_add_notes_to_deck(monkeypatch):
+    mw = useCollection(monkeypatch, FakeCollection(failingTerms={'broken'}))
+    config = {option: True for option in BASIC_OPTION + EXTRA_OPTION}
+    results = [QueryResult('flower', definition=['n. 花']), None, QueryResult('broken', definition=['x']), QueryResult('stint', definition=['v. 限制'])]
+
+    added = noteManager.addNotesToDeck({'id': 1}, {'name': 'Dict2Anki'}, config, results)
+
+    # 只有一个撤销检查点，只重置一次；单个笔记失败不影响其余笔记
+    assert added == 2
+    assert len(mw.checkpoints) == 1
+    assert mw.col.resets == 1
+    assert [(note['term'], note['definition']) for note in mw.col.notes] == [('flower', 'n. 花'), ('stint', 'v. 限制')]
+
+
+def deckCollection() -> Collection:
+    """Dict2Anki 牌组、其子牌组、一个筛选牌组和一个无关牌组，以及字段顺序不同的两个 Dict2Anki 模版和一个普通模版"""
+    col = Collection(
+        [model(1, 'Dict2Anki-v6.1.5', ['term', 'definition']), model(2, 'dict2anki', ['definition', 'term']), model(3, 'Basic', ['term', 'Back'])],
+        [{'id': 100, 'name': 'Dict2Anki'}, {'id': 101, 'name': 'Dict2Anki::sub'}, {'id': 200, 'name': 'Filtered'}, {'id': 300, 'name': 'Other'}]
+    )
+    col.addNotes([
+        (1, 1, ['flower', '花'], 100, 0),
+        (2, 1, ['stint', '限制'], 101, 0),  # 子牌组
+        (3, 1, ['moved', '移动'], 200, 100),  # 卡片暂时在筛选牌组中
+        (4, 2, ['含义', 'implication'], 100, 0),
+        (5, 3, ['basic', '普通模版'], 100, 0),
+        (6, 1, ['other', '其他牌组'], 300, 0),
+        (7, 1, ['', '没有单词'], 100, 0),
+        (8, 1, ['twice', '两张卡片'], 100, 0),
+    ])
+    col.addCard(8, 101)  # 同一笔记的第二张卡片
+    return col
+
+
+def test_get_words_by_deck(monkeypatch):
+    useCollection(monkeypatch, deckCollection())
+    # 包含子牌组和筛选牌组中的卡片，只统计 Dict2Anki 模版
+    assert noteManager.getWordsByDeck('Dict2Anki') == {'flower', 'stint', 'moved', 'implication', 'twice'}
+    assert noteManager.getWordsByDeck('Other') == {'other'}
+    assert noteManager.getWordsByDeck('Missing') == set()
+
+
+def test_get_notes(monkeypatch):
+    col = deckCollection()
+    col.addNotes([
+        (9, 1, ['flower', '重复的笔记'], 101, 0),
+        (10, 3, ['flower', '普通模版'], 100, 0),
+        (11, 1, ['Flower', '大写'], 100, 0),
+    ])
+    useCollection(monkeypatch, col)
+    # 同一单词的笔记全部返回，只匹配 Dict2Anki 模版，区分大小写
+    assert sorted(noteManager.getNotes(['flower'], 'Dict2Anki')) == [1, 9]
+    assert sorted(noteManager.getNotes(['moved', 'twice', 'missing'], 'Dict2Anki')) == [3, 8]
+    assert noteManager.getNotes(['basic'], 'Dict2Anki') == []
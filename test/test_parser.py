@@ -0,0 +1,48 @@
+import os
+import json
+from urllib.parse import urlparse, parse_qs
+import pytest
+from addon.queryApi import eudict, youdao
+from addon.constants import BASIC_OPTION
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+EUDICT_TERMS = ['flower', 'stint', 'implication', 'asafesdf']
+
+
+def load(fileName):
+    with open(os.path.join(FIXTURES, fileName), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('term', EUDICT_TERMS)
+@pytest.mark.parametrize('backend', ['html.parser', 'lxml'])
+def test_eudict_region_parse_matches_full_page(term, backend):
+    if backend == 'lxml':
+        pytest.importorskip('lxml')
+    html = load(f'eudict_{term}.html')
+    full = eudict.Parser(html, term, backend='html.parser', fullPage=True).result
+    assert eudict.Parser(html, term, backend=backend).result == full
+
+
+@pytest.mark.parametrize('term', EUDICT_TERMS)
+def test_eudict_field_projection(term):
+    html = load(f'eudict_{term}.html')
+    full = eudict.Parser(html, term).result
+    projected = eudict.Parser(html, term, fields={'definition', 'AmEPhonetic'}).result
+    assert projected.toDict() == dict(full.toDict(), sentence=None, phrase=None, image=None, BrEPhonetic=None)
+
+
+def test_youdao_requests_only_needed_dicts():
+    url = youdao.API.requestUrl('flower', {'definition', 'BrEPhonetic'})
+    assert 'web_trans' in url and 'blng_sents_part' not in url and 'pic_dict' not in url
+    assert youdao.API.requestUrl('flower') == youdao.API.requestUrl('flower', BASIC_OPTION)
+
+    # dicts 以 JSON 发送，只包含需要的词典
+    query = parse_qs(urlparse(youdao.API.requestUrl('flower', {'sentence'})).query)
+    assert query['q'] == ['flower']
+    assert json.loads(query['dicts'][0]) == {'count': 99, 'dicts': [['ec'], ['blng_sents_part']]}
+
+    full = youdao.API.parse(load('youdao_flower.json'), 'flower')
+    projected = youdao.API.parse(load('youdao_flower.json'), 'flower', {'sentence'})
+    assert projected['sentence'] == full['sentence']
+    assert projected['definition'] is None and projected['AmEPron'] == full['AmEPron']
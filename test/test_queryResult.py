@@ -0,0 +1,25 @@
+import json
+import pickle
+import pytest
+from addon.misc import QueryResult
+
+
+def test_query_result_serialization_is_stable():
+    result = QueryResult('flower', definition=['n. 花'], sentence=[['a', 'b']], AmEPron='url')
+    assert json.loads(result.dumps()) == ['flower', ['n. 花'], None, None, [['a', 'b']], None, None, None, 'url']
+    assert QueryResult.loads(result.dumps()) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert result.sentence == (('a', 'b'),)
+
+    # 旧版本缓存中的 dict
+    legacy = json.dumps({'term': 'flower', 'definition': ['n. 花'], 'sentence': [['a', 'b']], 'AmEPron': 'url'})
+    assert QueryResult.loads(legacy) == result
+
+
+def test_query_result_reads_like_dict():
+    result = QueryResult.of({'term': 'flower', 'image': 'img'})
+    assert result['image'] == result.get('image') == 'img'
+    assert result.get('noPron') is None and result.get('definition', 'x') is None
+    with pytest.raises(KeyError):
+        result['noPron']
+    assert QueryResult.of(result) is result and QueryResult.of(None) is None
@@ -0,0 +1,77 @@
+import time
+import pytest
+from addon.cache import QueryCache
+
+
+class DummyParser:
+    version = 1
+
+
+class DummyAPI:
+    name = 'dummy API'
+    parser = DummyParser
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = QueryCache(str(tmp_path / 'cache.db'), ttl=60, maxEntries=3)
+    yield c
+    c.close()
+
+
+def test_cache_round_trip(cache):
+    result = {'term': 'flower', 'definition': ['n. 花'], 'sentence': [('a', 'b')]}
+    assert cache.get(DummyAPI, 'flower') is None
+    cache.put(DummyAPI, 'flower', result)
+    cached = cache.get(DummyAPI, ' flower ')
+    assert cached['definition'] == ('n. 花',)
+    assert [tuple(s) for s in cached['sentence']] == [('a', 'b')]
+    assert cached['term'] == ' flower '
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_parser_version_invalidates(cache, monkeypatch):
+    cache.put(DummyAPI, 'flower', {'term': 'flower'})
+    monkeypatch.setattr(DummyParser, 'version', 2)
+    assert cache.get(DummyAPI, 'flower') is None
+
+
+def test_cache_ttl(cache, monkeypatch):
+    cache.put(DummyAPI, 'flower', {'term': 'flower'})
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get(DummyAPI, 'flower') is None
+
+
+def test_cache_lru_eviction(cache):
+    for word in ['a', 'b', 'c', 'd']:
+        cache.put(DummyAPI, word, {'term': word})
+        time.sleep(0.01)
+    cache.get(DummyAPI, 'a')
+    cache.evict()
+    assert cache.get(DummyAPI, 'a') is not None
+    assert cache.get(DummyAPI, 'b') is None
+    assert cache.get(DummyAPI, 'd') is not None
+
+
+def test_cache_requires_requested_fields(cache):
+    result = {'term': 'flower', 'definition': ['n. 花'], 'sentence': [('a', 'b')], 'image': None}
+    cache.put(DummyAPI, 'flower', result, {'definition', 'sentence'})
+    assert cache.get(DummyAPI, 'flower', {'definition', 'image'}) is None
+    assert cache.get(DummyAPI, 'flower') is None
+    cached = cache.get(DummyAPI, 'flower', {'definition'})
+    assert cached['definition'] == ('n. 花',) and cached['sentence'] is None
+
+    cache.put(DummyAPI, 'flower', result)
+    assert cache.get(DummyAPI, 'flower', {'image'}) is not None
+
+
+def test_negative_cache_ttl(tmp_path, monkeypatch):
+    cache = QueryCache(str(tmp_path / 'cache.db'), negativeTtl=60)
+    assert not cache.isKnownEmpty(DummyAPI, 'asafesdf')
+    cache.putEmpty(DummyAPI, 'asafesdf', 'empty')
+    assert cache.isKnownEmpty(DummyAPI, ' asafesdf')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert not cache.isKnownEmpty(DummyAPI, 'asafesdf')
+    cache.close()
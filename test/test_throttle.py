@@ -0,0 +1,44 @@
+from addon.throttle import AIMDController, RateLimiter
+
+
+def test_aimd_additive_increase():
+    controller = AIMDController(initial=2, maximum=4)
+    for _ in range(2):
+        controller.record(0.1)
+    assert controller.limit == 3
+    for _ in range(20):
+        controller.record(0.1)
+    assert controller.limit == 4
+
+
+def test_aimd_multiplicative_decrease():
+    controller = AIMDController(initial=8)
+    controller.record(0.1, failed=True)
+    assert controller.limit == 4
+    # 同一批失败只减一次
+    controller.record(0.1, failed=True)
+    assert controller.limit == 4
+
+
+def test_aimd_backs_off_on_latency():
+    controller = AIMDController(initial=8, latencyTarget=1.0)
+    for _ in range(10):
+        controller.record(2.0)
+    assert controller.limit < 8
+    assert controller.percentile(0.9) == 2.0
+
+
+def test_rate_limiter_per_host():
+    limiter = RateLimiter(rate=10, burst=2)
+    limiter.configure({'hosts': {'slow.example.com': {'rate': 1, 'burst': 1}}})
+    assert limiter.reserve('a.example.com') == 0
+    assert limiter.reserve('a.example.com') == 0
+    assert 0 < limiter.reserve('a.example.com') <= 0.1
+    assert limiter.reserve('slow.example.com') == 0
+    assert 0.9 < limiter.reserve('slow.example.com') <= 1
+
+
+def test_rate_limiter_pause():
+    limiter = RateLimiter(rate=10, burst=10)
+    limiter.pause('a.example.com', 5)
+    assert 5 < limiter.reserve('a.example.com') <= 5.1
@@ -0,0 +1,37 @@
+from PyQt5.QtCore import Qt
+from addon.wordModel import WordListModel
+
+
+def test_word_list_model_batches_rows():
+    model = WordListModel()
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.appendWords(['a', 'b'], WordListModel.WAIT)
+    model.appendWords([])
+    model.appendWords(['c'])
+    assert inserted == [(0, 1), (2, 2)]
+    assert [model.data(model.index(row)) for row in range(model.rowCount())] == ['a', 'b', 'c']
+
+    changed = []
+    model.dataChanged.connect(lambda topLeft, bottomRight, roles: changed.append((topLeft.row(), bottomRight.row())))
+    model.setResults([(0, {'term': 'a'}), (2, {'term': 'c'})])
+    model.setFailed([1])
+    assert changed == [(0, 2), (1, 1)]
+    assert model.results == [{'term': 'a'}, None, {'term': 'c'}]
+    assert model.statuses == [WordListModel.DONE, WordListModel.FAILED, WordListModel.DONE]
+
+
+def test_word_list_model_check_state():
+    model = WordListModel(checkable=True)
+    model.setWords(['a', 'b', 'c'], WordListModel.DELETE)
+    assert model.flags(model.index(0)) & Qt.ItemIsUserCheckable
+    assert model.setData(model.index(1), Qt.Unchecked, Qt.CheckStateRole)
+    assert model.data(model.index(1), Qt.CheckStateRole) == Qt.Unchecked
+    assert model.checkedWords() == ['a', 'c']
+
+    model.removeWords(model.checkedWords())
+    assert model.words == ['b']
+
+    plain = WordListModel()
+    plain.setWords(['a'])
+    assert not plain.flags(plain.index(0)) & Qt.ItemIsUserCheckable
@@ -0,0 +1,299 @@
+import time
+import sqlite3
+from threading import Lock, Event, Thread
+from PyQt5.QtCore import Qt
+from addon.cache import SnapshotStore, QueryCache
+from addon.misc import AbstractQueryAPI, getExecutor, shutdownExecutor
+from addon.workers import PullAndQueryWorker, RemoteWordFetchingWorker, QueryWorker, QueryConfig, AudioDownloadWorker
+
+
+class DummyDictionary:
+    pages = [['a', 'b', 'c'], ['d', 'e'], ['f', 'a']]
+
+    def getTotalPage(self, groupName, groupId):
+        return len(self.pages)
+
+    def getWordsByPage(self, pageNo, groupName, groupId):
+        return self.pages[pageNo]
+
+
+class DummyAPI(AbstractQueryAPI):
+    name = 'dummy API'
+    parser = None
+    fetched = []
+
+    @classmethod
+    def fetch(cls, word, fields=None):
+        cls.fetched.append(word)
+        if word == 'e':
+            raise ConnectionError(word)
+        return word
+
+    @classmethod
+    def parse(cls, text, word, fields=None):
+        if text == 'broken':
+            raise ValueError(text)
+        return {'term': word, 'definition': [] if text.startswith('typo') else [text]}
+
+
+def collect(signal):
+    lock = Lock()
+    emitted = []
+
+    def slot(*args):
+        with lock:
+            emitted.append(args[0] if len(args) == 1 else args)
+
+    signal.connect(slot, Qt.DirectConnection)  # 信号从线程池中发出，测试中没有事件循环
+    return emitted
+
+
+def test_pull_and_query_worker():
+    worker = PullAndQueryWorker(DummyDictionary(), [('group', 1)], {'a', 'z'}, QueryConfig(DummyAPI))
+    newWords = collect(worker.newWords)
+    diffs = collect(worker.diffDone)
+    done = collect(worker.rowsDone)
+    failed = collect(worker.rowsFailed)
+    worker.run()
+
+    rows = [word for words in newWords for word in words]
+    done = [item for batch in done for item in batch]
+    failed = [row for batch in failed for row in batch]
+    assert sorted(rows) == ['b', 'c', 'd', 'e', 'f']
+    assert diffs == [(rows, ['z'], ['a'])]
+    assert all(rows[row] == result['term'] for row, result in done)
+    assert [rows[row] for row in failed] == ['e']
+
+
+class SlowGroupsDictionary:
+    groups = {1: [['a', 'b'], ['c']], 2: [['d']], 3: [['e', 'f'], ['g'], ['h']]}
+
+    def getTotalPage(self, groupName, groupId):
+        time.sleep(0.1)
+        return len(self.groups[groupId])
+
+    def getWordsByPage(self, pageNo, groupName, groupId):
+        time.sleep(0.1)
+        return self.groups[groupId][pageNo]
+
+
+def test_remote_word_fetching_worker_pulls_groups_concurrently():
+    worker = RemoteWordFetchingWorker(SlowGroupsDictionary(), [('g1', 1), ('g2', 2), ('g3', 3)])
+    progress = collect(worker.setProgress)
+    groups = collect(worker.doneThisGroup)
+    start = time.perf_counter()
+    worker.run()
+
+    assert time.perf_counter() - start < 0.5  # 串行需要 (3 + 6) * 0.1 秒
+    assert progress == [6]
+    assert groups == [['a', 'b', 'c'], ['d'], ['e', 'f', 'g', 'h']]
+
+
+class NewestFirstDictionary:
+    name = 'newest first'
+    newestFirst = True
+    pageSize = 3
+
+    def __init__(self, words):
+        self.words = words
+        self.pulledPages = []
+
+    def getTotalWords(self, groupName, groupId):
+        return len(self.words)
+
+    def getTotalPage(self, groupName, groupId):
+        return -(-len(self.words) // self.pageSize)
+
+    def getWordsByPage(self, pageNo, groupName, groupId):
+        self.pulledPages.append(pageNo)
+        return self.words[pageNo * self.pageSize:(pageNo + 1) * self.pageSize]
+
+
+def pull(dictionary, snapshots):
+    worker = RemoteWordFetchingWorker(dictionary, [('group', 1)], snapshots=snapshots)
+    groups = collect(worker.doneThisGroup)
+    ticks = collect(worker.tick)
+    worker.run()
+    assert sum(ticks) == dictionary.getTotalPage('group', 1)
+    return groups[0]
+
+
+def test_incremental_pull():
+    snapshots = SnapshotStore(':memory:')
+    words = [f'w{i}' for i in range(20)]
+    assert pull(NewestFirstDictionary(words), snapshots) == words
+
+    # 新增的单词在最前面，遇到已知单词后核对末页即停止
+    words = ['n1', 'n2', 'n3'] + words
+    dictionary = NewestFirstDictionary(words)
+    assert pull(dictionary, snapshots) == words
+    assert dictionary.pulledPages == [0, 1, 7]
+
+    # 删除了单词，新单词数与总数变化不一致，第一页之后放弃，其余页并发获取且不重复获取
+    words = ['n5', 'n6'] + words[:10] + words[11:]
+    dictionary = NewestFirstDictionary(words)
+    assert pull(dictionary, snapshots) == words
+    assert sorted(dictionary.pulledPages) == list(range(dictionary.getTotalPage('group', 1)))
+    assert snapshots.get('newest first', 1)['words'] == words
+
+
+def test_incremental_pull_detects_wrong_order():
+    # 词典实际按添加时间正序返回，同时新增和删除一个单词，总数不变，不能返回过期的快照
+    snapshots = SnapshotStore(':memory:')
+    words = [f'w{i}' for i in range(20)]
+    pull(NewestFirstDictionary(words), snapshots)
+
+    words = words[:5] + words[6:] + ['n1']
+    assert pull(NewestFirstDictionary(words), snapshots) == words
+    assert snapshots.get('newest first', 1)['words'] == words
+
+
+def test_query_worker_negative_cache(tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache.db'))
+    terms = ['flower', 'typo1', 'broken', 'e']
+
+    def query():
+        DummyAPI.fetched = []
+        worker = QueryWorker(terms, range(len(terms)), QueryConfig(DummyAPI, cache=cache))
+        done = collect(worker.rowsDone)
+        failed = collect(worker.rowsFailed)
+        worker.run()
+        return sorted(row for batch in done for row, _ in batch), sorted(row for batch in failed for row in batch)
+
+    assert query() == ([0], [1, 2, 3])
+    # 无结果和解析失败的单词不再请求，网络错误的单词重试
+    assert query() == ([0], [1, 2, 3])
+    assert DummyAPI.fetched == ['e']
+    cache.close()
+
+
+class BatchAPI(DummyAPI):
+    """一次请求查询整批单词的 API"""
+    name = 'batch API'
+    batches = []
+
+    @classmethod
+    def queryMany(cls, words, fields=None, parse=None):
+        words = list(words)
+        cls.batches.append(words)
+        for word in words:
+            yield word, cls.parse(word, word, fields), None
+
+
+def test_query_worker_uses_query_many(tmp_path):
+    cache = QueryCache(str(tmp_path / 'cache.db'))
+    cache.put(BatchAPI, 'cached', {'term': 'cached', 'definition': ['cached']})
+    worker = QueryWorker(['a', 'cached', 'a', 'typo'], range(4), QueryConfig(BatchAPI, cache=cache))
+    done = collect(worker.rowsDone)
+    failed = collect(worker.rowsFailed)
+    worker.run()
+
+    assert BatchAPI.batches == [['a', 'a', 'typo']]
+    assert sorted(row for batch in done for row, _ in batch) == [0, 1, 2]
+    assert failed == [[3]]
+    cache.close()
+
+
+class LockedCache:
+    """另一个连接正在写入 cache.db 时的缓存"""
+
+    def __getattr__(self, name):
+        def locked(*args, **kwargs):
+            raise sqlite3.OperationalError('database is locked')
+        return locked
+
+
+class FailingAPI(DummyAPI):
+    name = 'failing API'
+
+    @classmethod
+    def queryMany(cls, words, fields=None, parse=None):
+        yield next(iter(words)), None, None
+        raise RuntimeError('queryMany')
+
+
+def test_query_worker_always_finishes():
+    # 缓存读写失败时照常查询
+    worker = QueryWorker(['a', 'b'], range(2), QueryConfig(DummyAPI, cache=LockedCache()))
+    done = collect(worker.rowsDone)
+    finished = collect(worker.allQueryDone)
+    worker.run()
+    assert sorted(row for batch in done for row, _ in batch) == [0, 1]
+    assert len(finished) == 1
+
+    # 查询中途出错也要发送 allQueryDone，否则界面按钮一直不可用
+    worker = QueryWorker(['a', 'b'], range(2), QueryConfig(FailingAPI))
+    failed = collect(worker.rowsFailed)
+    finished = collect(worker.allQueryDone)
+    worker.run()
+    assert failed == [[0]]
+    assert len(finished) == 1
+
+
+def test_query_worker_coalesces_signals():
+    worker = QueryWorker([f'w{row}' for row in range(200)], range(200), QueryConfig(DummyAPI))
+    ticks = collect(worker.tick)
+    done = collect(worker.rowsDone)
+    worker.run()
+
+    assert sum(ticks) == 200
+    assert sorted(row for batch in done for row, _ in batch) == list(range(200))
+    assert len(done) < 20
+
+
+def test_remote_word_fetching_worker_diffs_in_worker():
+    worker = RemoteWordFetchingWorker(DummyDictionary(), [('group', 1)], localWords=['z', 'a', 'f', 'y'])
+    diffs = collect(worker.diffDone)
+    worker.run()
+
+    assert diffs == [(['b', 'c', 'd', 'e'], ['z', 'y'], ['a', 'f'])]
+
+
+class BrokenDictionary(DummyDictionary):
+    def getWordsByPage(self, pageNo, groupName, groupId):
+        if pageNo == 1:
+            raise ConnectionError(pageNo)
+        return self.pages[pageNo]
+
+
+def test_pull_workers_always_finish():
+    # 获取出错时仍发送完成信号，不删除任何本地单词
+    worker = RemoteWordFetchingWorker(BrokenDictionary(), [('group', 1)], localWords=['z', 'a'])
+    diffs = collect(worker.diffDone)
+    done = collect(worker.done)
+    worker.run()
+    assert diffs == [([], [], ['z', 'a'])]
+    assert len(done) == 1
+
+    worker = PullAndQueryWorker(BrokenDictionary(), [('group', 1)], {'z', 'a'}, QueryConfig(DummyAPI))
+    diffs = collect(worker.diffDone)
+    finished = collect(worker.allQueryDone)
+    worker.run()
+    assert len(diffs) == 1 and diffs[0][:2] == ([], [])
+    assert len(finished) == 1
+
+
+def test_pull_and_query_worker_finishes_when_pull_is_cancelled():
+    executor = getExecutor()
+    gate = Event()
+    # 占满线程池，获取任务只能排队
+    for _ in range(executor._executor._max_workers):
+        executor.submit(gate.wait)
+    worker = PullAndQueryWorker(DummyDictionary(), [('group', 1)], set(), QueryConfig(DummyAPI))
+    finished = collect(worker.allQueryDone)
+    thread = Thread(target=worker.run)
+    thread.start()
+    time.sleep(0.1)
+    shutdownExecutor(wait=False)
+    gate.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(finished) == 1
+
+
+def test_audio_download_worker_always_finishes():
+    # 任务参数错误时异常从下载循环中抛出，仍要发送 done
+    worker = AudioDownloadWorker([('a.mp3', 'http://127.0.0.1:9/a.mp3', 'extra')])
+    done = collect(worker.done)
+    worker.run()
+    assert len(done) == 1